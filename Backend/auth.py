@@ -1,11 +1,20 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from collections import OrderedDict
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
+import metrics
 import models
 import os
 from dotenv import load_dotenv
@@ -16,18 +25,242 @@ SECRET_KEY = os.getenv("SECRET_KEY", "changeme")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor (2^rounds iterations), passlib's default is 12
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# bcrypt burns ~100-300 ms of CPU per call, so it runs on a bounded process
+# pool instead of the request threadpool. HASH_POOL_SIZE=0 hashes inline.
+# Every server worker (WEB_CONCURRENCY, same variable uvicorn / gunicorn read)
+# has its own pool, so by default they split the cores between them
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+# hash workers are never forked from the (threaded) server process
+HASH_POOL_START_METHOD = os.getenv(
+    "HASH_POOL_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+# max hashes queued + running, beyond that login/register get a 429
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", max(1, HASH_POOL_SIZE) * 4))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 bearer_scheme = HTTPBearer()
 
+# role -> permissions is tiny and rarely changes, so it's cached in process.
+# grant/revoke in this process invalidate it right away, other workers pick
+# the change up after PERMISSION_CACHE_TTL seconds
+PERMISSION_CACHE_TTL = float(os.getenv("PERMISSION_CACHE_TTL", 30))
+# optional cache of the User row per token subject (0 = disabled)
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 0))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+# opt-in: trust role / verification claims in the token instead of loading
+# the User row. A role change bumps users.token_version, checked against a
+# cached map that is refreshed every TOKEN_VERSION_CACHE_TTL seconds
+JWT_STATELESS_AUTH = os.getenv("JWT_STATELESS_AUTH", "false").lower() in ("1", "true", "yes")
+TOKEN_VERSION_CACHE_TTL = float(os.getenv("TOKEN_VERSION_CACHE_TTL", 15))
 
-def hash_password(password: str) -> str:
+
+def _hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def verify_password(plain: str, hashed: str) -> bool:
+def _verify(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+class HashPool:
+    # Bounded process pool for bcrypt with a queue depth limit (backpressure).
+    # Created once by start() at server startup (main.py lifespan), before the
+    # outbox / training threads. Until then (scripts such as seed.py) hashing
+    # runs inline - a spawned worker would re-run the script's __main__ - or,
+    # from async routes, on the threadpool so it never blocks the event loop
+    def __init__(self, size: int, queue_limit: int):
+        self.size = size
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+        self._lock = threading.Lock()
+        metrics.HASH_POOL_QUEUE_LIMIT.set(queue_limit)
+        metrics.HASH_POOL_IN_FLIGHT.set(0)
+
+    def start(self):
+        # creates the pool and starts the forkserver + a first worker
+        if self.size > 0:
+            with self._lock:
+                executor = self._get_executor()
+            executor.submit(int).result()
+
+    def _get_executor(self):
+        if self._executor is None:
+            context = multiprocessing.get_context(HASH_POOL_START_METHOD)
+            if HASH_POOL_START_METHOD == "forkserver":
+                context.set_forkserver_preload(["auth"])  # workers don't import passlib per spawn
+            self._executor = ProcessPoolExecutor(max_workers=self.size, mp_context=context)
+        return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.queue_limit:
+                self._rejected += 1
+                metrics.HASH_POOL_REJECTED.inc(1)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts in progress, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += 1
+            metrics.HASH_POOL_IN_FLIGHT.set(self._in_flight)
+            return self._executor
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            metrics.HASH_POOL_IN_FLIGHT.set(self._in_flight)
+
+    def run(self, fn, *args):
+        if self.size <= 0 or self._executor is None:
+            return fn(*args)
+        executor = self._acquire()
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            self._release()
+
+    async def run_async(self, fn, *args):
+        # same as run() but awaits the result instead of blocking a thread
+        if self.size <= 0 or self._executor is None:
+            return await run_in_threadpool(fn, *args)
+        executor = self._acquire()
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args))
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "queue_limit": self.queue_limit,
+            "in_flight": self._in_flight,
+            "completed_total": self._completed,
+            "rejected_total": self._rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hash_pool = HashPool(HASH_POOL_SIZE, HASH_QUEUE_LIMIT)
+
+
+def hash_password(password: str) -> str:
+    return hash_pool.run(_hash, password)
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    return hash_pool.run(_verify, plain, hashed)
+
+
+async def hash_password_async(password: str) -> str:
+    return await hash_pool.run_async(_hash, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await hash_pool.run_async(_verify, plain, hashed)
+
+
+class PermissionCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._version = 0
+        self._loaded = (None, 0.0, {})  # (version, loaded_at, {role: set(actions)})
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        # bump the version, next check reloads the table
+        with self._lock:
+            self._version += 1
+
+    def _reload(self, db: Session):
+        version = self._version
+        by_role = {}
+        for role, action in db.query(models.RolePermission.role, models.RolePermission.action):
+            by_role.setdefault(role, set()).add(action)
+        self._loaded = (version, time.monotonic(), by_role)
+        return by_role
+
+    def allows(self, db: Session, role: models.UserRole, action: models.PermissionAction) -> bool:
+        version, loaded_at, by_role = self._loaded
+        if version != self._version or time.monotonic() - loaded_at > self.ttl:
+            by_role = self._reload(db)
+        return action in by_role.get(role, ())
+
+
+class UserCache:
+    # small LRU of detached User rows keyed by user id, entries expire after ttl
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if time.monotonic() > expires_at:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def put(self, user_id: int, user: models.User):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+class TokenVersionCache:
+    # user_id -> token_version, only for users whose tokens were ever revoked
+    # (token_version > 0), so the map stays small
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._loaded = (0.0, None)  # (loaded_at, {user_id: token_version})
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = (0.0, None)
+
+    def current(self, db: Session, user_id: int) -> int:
+        loaded_at, versions = self._loaded
+        if versions is None or time.monotonic() - loaded_at > self.ttl:
+            versions = dict(
+                db.query(models.User.id, models.User.token_version).filter(models.User.token_version > 0)
+            )
+            self._loaded = (time.monotonic(), versions)
+        return versions.get(user_id, 0)
+
+
+permission_cache = PermissionCache(PERMISSION_CACHE_TTL)
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_SIZE)
+token_versions = TokenVersionCache(TOKEN_VERSION_CACHE_TTL)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -35,27 +268,88 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: Session = Depends(get_db),
-) -> models.User:
-    token = credentials.credentials
-    credentials_exception = HTTPException(
+def create_user_token(user: models.User) -> str:
+    # sub + the claims needed to authorize without a DB lookup (JWT_STATELESS_AUTH)
+    return create_access_token({
+        "sub": str(user.id),
+        "role": user.role.value,
+        "ver": bool(user.is_verified),
+        "tv": user.token_version or 0,
+    })
+
+
+def bump_token_version(db: Session, user: models.User):
+    # Claims in tokens issued to this user so far are no longer trusted:
+    # those tokens fall back to the DB lookup (fresh role) until re-login
+    user.token_version = (user.token_version or 0) + 1
+    db.commit()
+    user_cache.evict(user.id)
+    token_versions.invalidate()
+
+
+def _user_from_claims(payload: dict, user_id: int, db: Session) -> Optional[models.User]:
+    # Transient (not loaded) User carrying only id / role / is_verified.
+    # None if the token has no claims (older token) or its token_version is
+    # outdated (role changed) -> normal DB lookup
+    if "role" not in payload or "tv" not in payload:
+        return None
+    if payload["tv"] < token_versions.current(db, user_id):
+        return None
+    try:
+        role = models.UserRole(payload["role"])
+    except ValueError:
+        return None
+    return models.User(id=user_id, role=role, is_verified=bool(payload.get("ver")))
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_access_token(token: str):
+    # returns (user_id, payload), 401 if the token is invalid
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        raise _credentials_exception()
+    return user_id, payload
 
-    user = db.query(models.User).filter(models.User.id == int(user_id)).first()
+
+def _check_permission(current_user: models.User, action: models.PermissionAction, allowed: bool):
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Role '{current_user.role}' does not have permission: '{action}'",
+        )
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: Session = Depends(get_db),
+) -> models.User:
+    user_id, payload = _decode_access_token(credentials.credentials)
+
+    if JWT_STATELESS_AUTH:
+        user = _user_from_claims(payload, user_id, db)
+        if user is not None:
+            return user
+
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    user = db.query(models.User).filter(models.User.id == user_id).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    if user_cache.ttl > 0:
+        # detach it so it can outlive this request's session
+        db.expunge(user)
+        user_cache.put(user_id, user)
     return user
 
 
@@ -68,19 +362,63 @@ def require_permission(action: models.PermissionAction):
         if current_user.role == models.UserRole.admin:
             return current_user
 
-        allowed = db.query(models.RolePermission).filter(
-            models.RolePermission.role == current_user.role,
-            models.RolePermission.action == action,
-        ).first()
+        _check_permission(current_user, action, permission_cache.allows(db, current_user.role, action))
+        return current_user
 
-        if not allowed:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Role '{current_user.role}' does not have permission: '{action}'",
-            )
+    return _check
+
+
+def require_admin(current_user: models.User = Depends(get_current_user)) -> models.User:
+    # for operational endpoints that are not part of the role/permission table
+    if current_user.role != models.UserRole.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return current_user
+
+
+# Async versions of the dependencies above (DB_ASYNC routes).
+# The caches are shared, their (rare) reloads run through run_sync
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> models.User:
+    user_id, payload = _decode_access_token(credentials.credentials)
+
+    if JWT_STATELESS_AUTH:
+        user = await db.run_sync(lambda s: _user_from_claims(payload, user_id, s))
+        if user is not None:
+            return user
+
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    user = await db.get(models.User, user_id)
+    if user is None:
+        raise _credentials_exception()
+    if user_cache.ttl > 0:
+        db.expunge(user)
+        user_cache.put(user_id, user)
+    return user
+
+
+def require_permission_async(action: models.PermissionAction):
+    async def _check(
+        current_user: models.User = Depends(get_current_user_async),
+        db: AsyncSession = Depends(get_async_db),
+    ) -> models.User:
+        if current_user.role == models.UserRole.admin:
+            return current_user
+
+        allowed = await db.run_sync(lambda s: permission_cache.allows(s, current_user.role, action))
+        _check_permission(current_user, action, allowed)
         return current_user
 
     return _check
+
+
+async def require_admin_async(current_user: models.User = Depends(get_current_user_async)) -> models.User:
+    return require_admin(current_user)
 # here email verification logic is written - 
 def create_verification_token(email: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(hours=24)
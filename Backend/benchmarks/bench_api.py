@@ -0,0 +1,271 @@
+# Load test / benchmark suite for the product API.
+#
+#   python benchmarks/bench_api.py [--sizes 1000 100000 1000000] [--requests 200]
+#                                  [--concurrency 1] [--database-url postgresql://...]
+#                                  [--output results.json] [--compare baseline.json]
+#
+# For every catalog size (synthetic products with the product_data.csv
+# schema, see synthetic.py) a fresh child process:
+# - loads the catalog into a scratch database (a temp SQLite file by default;
+#   with --database-url the tables are DROPPED and recreated, so point it at a
+#   throwaway PostgreSQL database), trains the demand model and builds the
+#   pricing snapshot
+# - drives login and every route of routes/product_routes.py through the
+#   in-process ASGI app (httpx ASGITransport, no network), one warm-up
+#   request per endpoint, then `--requests` timed ones (fewer for the
+#   catalog wide reports on big catalogs, see HEAVY_REQUESTS)
+# - reports p50 / p95 / p99 / mean latency, throughput and the process'
+#   peak RSS after each endpoint
+#
+# Results go to a JSON file (benchmarks/results/<commit>-<time>.json by
+# default) with the commit, interpreter and database, and --compare prints
+# the p50 / p95 ratio against an earlier file, so regressions show up across
+# commits. Model artifacts go to a temp MODEL_DIR, the repo's are untouched.
+
+import argparse, asyncio, json, os, platform, resource, subprocess, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+HEAVY_REQUESTS = 3        # catalog wide endpoints on catalogs of HEAVY_FROM products or more
+HEAVY_FROM = 100_000
+LOGIN_REQUESTS = 20       # bcrypt bound, more only measures the hash cost
+BULK_ROWS = 1000          # rows per POST /bulk upload
+SEED_CHUNK = 50_000
+PASSWORD = "bench1234"
+
+
+def _seed(n):
+    from sqlalchemy import insert
+    import auth, ml_model, models, pricing_snapshot
+    from database import SessionLocal
+    from synthetic import generate_columns
+
+    keys = ["name", "description", "cost_price", "selling_price", "category",
+            "stock_available", "units_sold", "customer_rating", "demand_forecast", "optimized_price"]
+    cols = generate_columns(n)
+    db = SessionLocal()
+    for i in range(0, n, SEED_CHUNK):
+        db.execute(insert(models.Product), [
+            dict(zip(keys, r)) for r in zip(*(cols[k][i:i + SEED_CHUNK].tolist() for k in keys))
+        ])
+    db.add(models.User(username="bench", email="bench@demo.com", role=models.UserRole.admin,
+                       hashed_password=auth.hash_password(PASSWORD), is_verified=True))
+    db.commit()
+    model, scaler = ml_model.train_model(db)
+    pricing_snapshot.rebuild(db, model, scaler, ml_model.registry.version)
+    db.close()
+
+
+def _bulk_csv(n, rows):
+    from synthetic import generate_dataframe
+    frame = generate_dataframe(rows, seed=n).drop(columns=["product_id", "demand_forecast", "optimized_price"])
+    frame["name"] = "Bulk " + frame["name"]
+    return frame.to_csv(index=False).encode()
+
+
+def _endpoints(n, requests):
+    # (name, method, path or path(i), kwargs or kwargs(i), requests, before each request)
+    import response_cache
+
+    heavy = HEAVY_REQUESTS if n >= HEAVY_FROM else requests
+    product = lambda i: 1 + (i * 7919) % n
+    created = []  # ids from the create endpoint, updated then deleted
+    new_product = {"name": "Bench product", "cost_price": "5.00", "selling_price": "9.00",
+                   "category": "Electronics", "stock_available": 20, "units_sold": 10}
+    bulk = _bulk_csv(n, BULK_ROWS)
+    cold = response_cache.invalidate
+
+    return [
+        ("login", "POST", "/api/auth/login", {"json": {"email": "bench@demo.com", "password": PASSWORD}},
+         LOGIN_REQUESTS, None),
+        ("get_product", "GET", lambda i: f"/api/products/{product(i)}", {}, requests, None),
+        ("list_page", "GET", lambda i: f"/api/products?limit=50&cursor={product(i)}", {}, requests, None),
+        ("list_fields", "GET", lambda i: f"/api/products?limit=200&fields=product_id,name,selling_price&cursor={product(i)}",
+         {}, requests, None),
+        ("search", "GET", "/api/products/search?q=wireless%20speaker", {}, requests, None),
+        ("autocomplete", "GET", "/api/products/autocomplete?prefix=Smart", {}, requests, None),
+        ("forecast", "GET", "/api/products/forecast", {}, requests, None),
+        ("forecast_uncached", "GET", "/api/products/forecast", {}, heavy, cold),
+        ("forecast_sql_uncached", "GET", "/api/products/forecast?mode=sql", {}, heavy, cold),
+        ("optimized", "GET", "/api/products/optimized", {}, requests, None),
+        ("optimized_uncached", "GET", "/api/products/optimized", {}, heavy, cold),
+        ("optimized_sql_uncached", "GET", "/api/products/optimized?mode=sql", {}, heavy, cold),
+        ("optimized_elasticity", "GET", "/api/products/optimized?mode=elasticity", {}, heavy, cold),
+        ("list_all", "GET", "/api/products", {}, heavy, None),
+        ("export_ndjson", "GET", "/api/products?format=ndjson", {}, heavy, None),
+        ("create_product", "POST", "/api/products", {"json": new_product}, requests, None),
+        ("update_product", "PUT", lambda i: f"/api/products/{created[i % len(created)]}",
+         lambda i: {"json": {"units_sold": 10 + i}}, lambda: min(requests, len(created)), None),
+        ("delete_product", "DELETE", lambda i: f"/api/products/{created.pop()}", {},
+         lambda: len(created), None),
+        ("bulk_import", "POST", "/api/products/bulk",
+         lambda i: {"files": {"file": ("bench.csv", bulk, "text/csv")}}, HEAVY_REQUESTS, None),
+    ], created
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+async def _run_endpoint(client, headers, endpoint, concurrency, created):
+    name, method, path, kwargs, count, before = endpoint
+    count = count() if callable(count) else count
+    resolve = lambda value, i: value(i) if callable(value) else value
+
+    async def call(i):
+        r = await client.request(method, resolve(path, i), headers=headers, **resolve(kwargs, i))
+        if name == "create_product" and r.status_code == 201:
+            created.append(r.json()["product_id"])
+        return r.status_code
+
+    if name != "delete_product" and count:
+        if before:
+            before()
+        await call(count)  # warm-up (caches, search index, pools)
+        if name == "create_product":
+            await client.delete(f"/api/products/{created.pop()}", headers=headers)
+
+    latencies, codes, queue = [], [], list(range(count))
+    started = time.perf_counter()
+
+    async def worker():
+        while queue:
+            i = queue.pop(0)
+            if before:
+                before()
+            t0 = time.perf_counter()
+            codes.append(await call(i))
+            latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, count) or 1)])
+    elapsed = time.perf_counter() - started
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "endpoint": name,
+        "method": method,
+        "requests": count,
+        "errors": sum(1 for c in codes if c >= 400),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "rps": round(count / elapsed, 1) if elapsed > 0 else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+async def _drive(app, n, requests, concurrency, only):
+    import httpx
+
+    endpoints, created = _endpoints(n, requests)
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        r = await client.post("/api/auth/login", json={"email": "bench@demo.com", "password": PASSWORD})
+        headers = {"Authorization": "Bearer " + r.json()["access_token"]}
+        for endpoint in endpoints:
+            if only and endpoint[0] not in only:
+                continue
+            results.append(await _run_endpoint(client, headers, endpoint, concurrency, created))
+            print(f"  {n:>8} {results[-1]['endpoint']:<21} p50 {results[-1]['p50_ms']:>9.2f} ms", file=sys.stderr)
+    return results
+
+
+def child(n, requests, concurrency, only):
+    import models
+    from database import engine
+    models.Base.metadata.drop_all(bind=engine)  # scratch database, see the header
+    import main, ml_model  # creates the tables / runs the migrations
+
+    started = time.perf_counter()
+    _seed(n)
+    seed_seconds = time.perf_counter() - started
+    seed_rss = _peak_rss_mb()
+    ml_model.registry.load()
+
+    results = asyncio.run(_drive(main.app, n, requests, concurrency, only))
+    print(json.dumps({"catalog": n, "seed_seconds": round(seed_seconds, 2),
+                      "seed_peak_rss_mb": round(seed_rss, 1), "results": results}))
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r["catalog"], r["endpoint"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline_path} ({baseline['meta']['commit']})")
+    print(f"{'catalog':>8} {'endpoint':<21} {'p50 x':>7} {'p95 x':>7}")
+    for r in current["results"]:
+        old = before.get((r["catalog"], r["endpoint"]))
+        if old and old["p50_ms"] > 0 and old["p95_ms"] > 0:
+            print(f"{r['catalog']:>8} {r['endpoint']:<21} {r['p50_ms'] / old['p50_ms']:>7.2f} "
+                  f"{r['p95_ms'] / old['p95_ms']:>7.2f}")
+
+
+def run(args):
+    commit = _commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": "postgresql" if args.database_url else "sqlite",
+            "db_async": os.getenv("DB_ASYNC", "false"),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "catalogs": [],
+        "results": [],
+    }
+    for n in args.sizes:
+        model_dir = tempfile.mkdtemp()
+        env = dict(os.environ, MODEL_DIR=model_dir, TRAIN_JOBS="1",
+                   DATABASE_URL=args.database_url or f"sqlite:///{model_dir}/bench.db")
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(n), str(args.requests), str(args.concurrency),
+             ",".join(args.endpoints or [])],
+            env=env, stdout=subprocess.PIPE, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        report["catalogs"].append({k: result[k] for k in ("catalog", "seed_seconds", "seed_peak_rss_mb")})
+        report["results"] += [{"catalog": n, **r} for r in result["results"]]
+
+    print(f"{'catalog':>8} {'endpoint':<21} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'rss MB':>7} {'err':>4}")
+    for r in report["results"]:
+        print(f"{r['catalog']:>8} {r['endpoint']:<21} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{r['rps'] or 0:>8.1f} {r['peak_rss_mb']:>7.0f} {r['errors']:>4}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nsaved {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        n, requests, concurrency, only = sys.argv[sys.argv.index("--child") + 1:]
+        child(int(n), int(requests), int(concurrency), set(filter(None, only.split(","))))
+    else:
+        parser = argparse.ArgumentParser(description="Benchmark the product API")
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+        parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+        parser.add_argument("--concurrency", type=int, default=1, help="concurrent clients per endpoint")
+        parser.add_argument("--endpoints", nargs="+", help="only these endpoints (names as in the report)")
+        parser.add_argument("--database-url", help="scratch PostgreSQL database (its tables are dropped)")
+        parser.add_argument("--output", help="JSON results file")
+        parser.add_argument("--compare", help="earlier JSON results file to compare against")
+        run(parser.parse_args())
@@ -0,0 +1,53 @@
+# Registration latency and outbox drain rate against the fake email provider.
+#
+#   EMAIL_FAKE_LATENCY_MS=200 python benchmarks/bench_email_outbox.py [registrations]
+#
+# Registration only inserts the outbox row, so its latency should not move
+# with EMAIL_FAKE_LATENCY_MS; the drain rate is bounded by the provider.
+
+import os, sys, statistics, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ["EMAIL_PROVIDER"] = "fake"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")  # keep hashing out of the numbers
+os.environ.setdefault("HASH_POOL_SIZE", "0")
+
+from fastapi.testclient import TestClient
+
+import email_service, models
+from database import SessionLocal
+
+
+def run(n):
+    import main
+
+    # no lifespan -> no background sender, the outbox is drained below
+    client = TestClient(main.app)
+
+    timings = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        r = client.post("/api/auth/register",
+                        json={"username": f"user{i}", "email": f"user{i}@bench.dev", "password": "bench1234"})
+        timings.append((time.perf_counter() - t0) * 1000)
+        assert r.status_code == 201, r.text
+    timings.sort()
+    print(f"register p50 {statistics.median(timings):.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms "
+          f"(provider latency {os.getenv('EMAIL_FAKE_LATENCY_MS', '0')} ms)")
+
+    sender = email_service.OutboxSender(SessionLocal, email_service.FakeProvider())
+    t0 = time.perf_counter()
+    while sender.send_batch():
+        pass
+    elapsed = time.perf_counter() - t0
+    db = SessionLocal()
+    sent = db.query(models.EmailOutbox).filter(models.EmailOutbox.status == models.EmailStatus.sent).count()
+    db.close()
+    print(f"drained {sent} emails in {elapsed:.2f}s ({sent / elapsed:.1f}/s, batch {email_service.EMAIL_BATCH_SIZE})")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
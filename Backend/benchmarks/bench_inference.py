@@ -0,0 +1,52 @@
+# Per-SKU inference latency: predict_demand (one call per product) vs
+# predict_demand_batch (one call for the whole catalog).
+#
+#   python benchmarks/bench_inference.py [sizes...]
+#
+# The per-product loop is only timed on a sample for large catalogs
+# (it is linear, so the per-SKU number is the same).
+
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from ml_model import prepare_features, predict_demand, predict_demand_batch
+from synthetic import generate_products
+
+LOOP_SAMPLE = 20_000
+
+
+def fit(products):
+    X = prepare_features(products)
+    y = np.array([p.demand_forecast for p in products])
+    scaler = StandardScaler().fit(X)
+    return LinearRegression().fit(scaler.transform(X), y), scaler
+
+
+def run(sizes):
+    train_set = generate_products(1000, seed=7)
+    model, scaler = fit(train_set)
+
+    print(f"{'rows':>10} {'loop us/sku':>12} {'batch us/sku':>13} {'speedup':>8}")
+    for n in sizes:
+        products = generate_products(n)
+
+        sample = products[:LOOP_SAMPLE]
+        t0 = time.perf_counter()
+        loop = [predict_demand(p, model, scaler) for p in sample]
+        loop_us = (time.perf_counter() - t0) / len(sample) * 1e6
+
+        t0 = time.perf_counter()
+        batch = predict_demand_batch(products, model, scaler)
+        batch_us = (time.perf_counter() - t0) / n * 1e6
+
+        assert np.allclose(batch[:len(sample)], loop)
+        print(f"{n:>10} {loop_us:>12.2f} {batch_us:>13.3f} {loop_us / batch_us:>7.0f}x")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    run(sizes)
@@ -0,0 +1,66 @@
+# Login throughput vs bcrypt pool size.
+#
+#   BCRYPT_ROUNDS=12 python benchmarks/bench_login.py [concurrent_logins]
+#
+# Fires concurrent POST /api/auth/login through the in-process ASGI app for
+# hash pool sizes 1, 2, 4 ... cpu_count and reports logins/s and how many
+# requests were turned away with 429.
+
+import asyncio, os, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+import httpx
+
+import auth, models
+from database import SessionLocal
+
+EMAIL, PASSWORD = "bench@demo.com", "bench1234"
+
+
+def _pool_sizes():
+    sizes, n = [], 1
+    while n < (os.cpu_count() or 1):
+        sizes.append(n)
+        n *= 2
+    return sizes + [os.cpu_count() or 1]
+
+
+async def _burst(app, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD})
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - t0
+    codes = [r.status_code for r in responses]
+    return elapsed, codes.count(200), codes.count(429)
+
+
+def run(concurrency):
+    import main
+
+    db = SessionLocal()
+    db.add(models.User(username="bench", email=EMAIL, hashed_password=auth._hash(PASSWORD),
+                       role=models.UserRole.buyer, is_verified=True))
+    db.commit()
+    db.close()
+
+    print(f"bcrypt rounds {auth.BCRYPT_ROUNDS}, {concurrency} concurrent logins")
+    print(f"{'workers':>8} {'logins/s':>9} {'ok':>5} {'429':>5}")
+    for size in _pool_sizes():
+        auth.hash_pool.shutdown()
+        # queue limit high enough that the whole burst is accepted
+        auth.hash_pool = auth.HashPool(size, concurrency)
+        auth.hash_pool.start()  # start the workers outside the timing
+        elapsed, ok, rejected = asyncio.run(_burst(main.app, concurrency))
+        print(f"{size:>8} {ok / elapsed:>9.1f} {ok:>5} {rejected:>5}")
+    auth.hash_pool.shutdown()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 32)
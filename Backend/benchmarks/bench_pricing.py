@@ -0,0 +1,57 @@
+# Pricing formulas: scalar functions (one call per product) vs the pricing
+# engine (array functions in pricing.py, one pass over the columns).
+#
+#   python benchmarks/bench_pricing.py [sizes...]
+#
+# Checks both give bit-identical results for every SKU before timing.
+
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pricing import (
+    compute_demand_forecast, compute_optimized_price, optimized_price,
+    compute_demand_forecast_array, compute_optimized_price_array, optimized_price_array,
+)
+from synthetic import generate_columns
+
+
+def _time(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def run(sizes):
+    print(f"{'rows':>10} {'formula':>18} {'scalar ms':>10} {'engine ms':>10} {'speedup':>8}")
+    for n in sizes:
+        cols = generate_columns(n)
+        units, stock = cols["units_sold"].tolist(), cols["stock_available"].tolist()
+        cost, selling = cols["cost_price"].tolist(), cols["selling_price"].tolist()
+
+        scalar, scalar_ms = _time(lambda: [compute_demand_forecast(u, s) for u, s in zip(units, stock)])
+        engine, engine_ms = _time(lambda: compute_demand_forecast_array(cols["units_sold"], cols["stock_available"]))
+        assert engine.tolist() == scalar
+        print(f"{n:>10} {'demand_forecast':>18} {scalar_ms:>10.1f} {engine_ms:>10.1f} {scalar_ms / engine_ms:>7.0f}x")
+
+        forecasts = scalar
+        avg = sum(forecasts) / n
+        scalar, scalar_ms = _time(lambda: [
+            compute_optimized_price(c, s, f, avg) for c, s, f in zip(cost, selling, forecasts)
+        ])
+        engine, engine_ms = _time(lambda: compute_optimized_price_array(
+            cols["cost_price"], cols["selling_price"], forecasts, avg))
+        assert engine.tolist() == scalar
+        print(f"{n:>10} {'optimized_price':>18} {scalar_ms:>10.1f} {engine_ms:>10.1f} {scalar_ms / engine_ms:>7.0f}x")
+
+        ml = cols["demand_forecast"].tolist()
+        avg = sum(ml) / n
+        scalar, scalar_ms = _time(lambda: [optimized_price(c, s, f, avg) for c, s, f in zip(cost, selling, ml)])
+        engine, engine_ms = _time(lambda: optimized_price_array(
+            cols["cost_price"], cols["selling_price"], cols["demand_forecast"], avg))
+        assert engine.tolist() == scalar
+        print(f"{n:>10} {'snapshot price':>18} {scalar_ms:>10.1f} {engine_ms:>10.1f} {scalar_ms / engine_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    run(sizes)
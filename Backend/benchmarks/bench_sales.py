@@ -0,0 +1,74 @@
+# Sales history: ingestion throughput and forecasting engine time.
+#
+#   python benchmarks/bench_sales.py [events] [skus]
+#
+# Ingests `events` point of sale events (batches of 50k, spread over 1000
+# products and 28 days) into a scratch SQLite database, then runs the
+# forecasting engine over `skus` synthetic daily series (weekly pattern +
+# Poisson noise) of SALES_HISTORY_DAYS days. The engine only sees the daily
+# rollup, so its time depends on skus x days, not on the event volume.
+
+import os, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_sales.db"
+
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import insert
+
+import models, schemas
+from database import engine, SessionLocal
+from sales import ingest_events
+from sales_forecast import SALES_HISTORY_DAYS, daily_matrix, first_sale, forecast_units
+
+BATCH = 50_000
+PRODUCTS = 1000
+
+
+def bench_ingest(n):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.execute(insert(models.Product), [
+        {"product_id": i, "name": f"P{i}", "cost_price": 5, "selling_price": 10, "stock_available": 100, "units_sold": 0}
+        for i in range(1, PRODUCTS + 1)
+    ])
+    db.commit()
+
+    rng = np.random.default_rng(0)
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    seconds = 0.0
+    for first in range(0, n, BATCH):
+        size = min(BATCH, n - first)
+        events = [
+            schemas.SalesEventIn(product_id=pid, quantity=qty, sold_at=now - timedelta(minutes=m))
+            for pid, qty, m in zip(rng.integers(1, PRODUCTS + 1, size).tolist(),
+                                   rng.integers(1, 5, size).tolist(),
+                                   rng.integers(0, 28 * 24 * 60, size).tolist())
+        ]
+        t0 = time.perf_counter()
+        ingest_events(db, events)
+        seconds += time.perf_counter() - t0
+    print(f"ingest: {n} events in {seconds:.2f}s ({n / seconds:,.0f} events/s)")
+
+    t0 = time.perf_counter()
+    ids, Y = daily_matrix(db, now.date())
+    print(f"daily matrix: {len(ids)} products x {Y.shape[1]} days in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    db.close()
+
+
+def bench_engine(skus):
+    rng = np.random.default_rng(1)
+    weekly = np.array([1.0, 0.9, 0.9, 1.0, 1.2, 1.6, 1.4])
+    base = rng.gamma(2.0, 5.0, skus)[:, None]
+    Y = rng.poisson(base * np.tile(weekly, SALES_HISTORY_DAYS // 7 + 1)[:SALES_HISTORY_DAYS]).astype(float)
+    t0 = time.perf_counter()
+    forecast_units(Y, first_sale(Y))
+    seconds = time.perf_counter() - t0
+    print(f"engine: {skus} SKUs x {SALES_HISTORY_DAYS} days in {seconds:.2f}s ({skus / seconds:,.0f} SKUs/s)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    events, skus = args + [200_000, 1_000_000][len(args):]
+    bench_ingest(events)
+    bench_engine(skus)
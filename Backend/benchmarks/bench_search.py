@@ -0,0 +1,64 @@
+# Product search latency on a synthetic catalog.
+#
+#   python benchmarks/bench_search.py [rows]          (default 1M)
+#
+# Compares the in-memory trigram index used on SQLite (search.NgramIndex)
+# with the linear scan a leading-wildcard ILIKE does. If DATABASE_URL points
+# at PostgreSQL with the catalog loaded (e.g. via bulk_import.py), the
+# indexed SQL path is timed as well.
+
+import os, sys, statistics, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from search import NgramIndex
+from synthetic import generate_columns
+
+QUERIES = ["wireless", "smart kettle", "headphnes", "waterproof tent", "fitness"]
+PREFIXES = ["Wi", "Smart K", "Eco-Friendly W", "Pro"]
+REPEAT = 5
+
+
+def _time_ms(fn):
+    timings = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings)
+
+
+def run(n):
+    cols = generate_columns(n)
+    rows = list(zip(cols["product_id"].tolist(), cols["name"].tolist(),
+                    cols["description"].tolist(), cols["category"].tolist()))
+
+    index = NgramIndex()
+    t0 = time.perf_counter()
+    index.build(rows)
+    print(f"built trigram index over {n} products in {time.perf_counter() - t0:.1f}s")
+
+    print(f"{'query':>20} {'index ms':>9} {'scan ms':>9}")
+    for q in QUERIES:
+        indexed = _time_ms(lambda: index.search(q, 20))
+        scan = _time_ms(lambda: [r for r in rows if q in f"{r[1]} {r[2]} {r[3]}".lower()][:20])
+        print(f"{q:>20} {indexed:>9.2f} {scan:>9.2f}")
+    for p in PREFIXES:
+        indexed = _time_ms(lambda: index.autocomplete(p, 10))
+        scan = _time_ms(lambda: sorted(r[1] for r in rows if r[1].lower().startswith(p.lower()))[:10])
+        print(f"{'prefix ' + p:>20} {indexed:>9.2f} {scan:>9.2f}")
+
+    url = os.getenv("DATABASE_URL", "")
+    if url.startswith("postgresql"):
+        from database import SessionLocal
+        import search
+        db = SessionLocal()
+        print(f"{'query':>20} {'postgres ms':>12}")
+        for q in QUERIES:
+            print(f"{q:>20} {_time_ms(lambda: search.search_products(db, q, 20)):>12.2f}")
+        for p in PREFIXES:
+            print(f"{'prefix ' + p:>20} {_time_ms(lambda: search.autocomplete(db, p, 10)):>12.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,56 @@
+# Segmented (per-category) training wall-clock vs core count.
+#
+#   python benchmarks/bench_segmented_training.py [products] [segments]
+#
+# Fits the global model plus one model per category with fit_segmented for
+# n_jobs = 1, 2, 4 ... cpu_count and reports seconds and speedup over 1 job.
+# The single global fit is printed as the baseline. Categories are synthetic
+# ("segment 0" ... "segment N-1") so the fan-out can be sized independently
+# of the fixed category list.
+
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from ml_model import fit_segmented, predict_matrix, _fit
+from synthetic import generate_columns
+
+
+def _job_counts():
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def run(n, segments):
+    cols = generate_columns(n)
+    X = np.column_stack([cols[c] for c in ("cost_price", "selling_price", "stock_available",
+                                            "units_sold", "customer_rating")]).astype(float)
+    y = cols["demand_forecast"]
+    categories = np.array([f"segment {i}" for i in np.random.default_rng(0).integers(0, segments, n)], dtype=object)
+
+    t0 = time.perf_counter()
+    _fit(X, y)
+    print(f"{n} products, {segments} segments, {os.cpu_count()} cores")
+    print(f"global model only: {time.perf_counter() - t0:.2f}s")
+
+    print(f"{'n_jobs':>7} {'seconds':>8} {'speedup':>8}")
+    baseline = None
+    for jobs in _job_counts():
+        t0 = time.perf_counter()
+        model = fit_segmented(X, y, categories, n_jobs=jobs, min_segment_size=1)
+        seconds = time.perf_counter() - t0
+        baseline = baseline or seconds
+        print(f"{jobs:>7} {seconds:>8.2f} {baseline / seconds:>7.1f}x")
+
+    t0 = time.perf_counter()
+    predict_matrix(X, model, model.scaler, categories)
+    print(f"routed batch prediction: {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(*(args + [1_000_000, 64][len(args):]))
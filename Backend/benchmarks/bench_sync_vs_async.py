@@ -0,0 +1,104 @@
+# Requests/s of the sync routes vs the DB_ASYNC routes under concurrency.
+#
+#   python benchmarks/bench_sync_vs_async.py [products] [concurrency] [requests]
+#   DATABASE_URL=postgresql://... python benchmarks/bench_sync_vs_async.py
+#
+# Seeds one catalog, then runs the same read mix (product by id, a page of
+# the list, /forecast) through the in-process ASGI app once per mode. Each
+# mode runs in its own process since DB_ASYNC is read at import time.
+# The sync routes are capped by the threadpool (40 threads by default), the
+# async ones by DB_POOL_SIZE + DB_MAX_OVERFLOW - so run it against PostgreSQL
+# for meaningful numbers, SQLite serializes everything anyway.
+
+import asyncio, json, os, subprocess, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+if __name__ == "__main__" and "--child" not in sys.argv:
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+
+def _seed(n):
+    from sqlalchemy import insert
+    import auth, models, pricing_snapshot
+    from database import SessionLocal, engine
+    from synthetic import generate_columns
+
+    models.Base.metadata.create_all(bind=engine)
+
+    keys = ["name", "description", "cost_price", "selling_price", "category",
+            "stock_available", "units_sold", "customer_rating", "demand_forecast", "optimized_price"]
+    cols = generate_columns(n)
+    db = SessionLocal()
+    db.execute(insert(models.Product), [dict(zip(keys, r)) for r in zip(*(cols[k].tolist() for k in keys))])
+    admin = models.User(username="bench", email="bench@demo.com", role=models.UserRole.admin,
+                        hashed_password=auth.hash_password("bench1234"), is_verified=True)
+    db.add(admin)
+    db.commit()
+    pricing_snapshot.rebuild(db, None, None, None)
+    token = auth.create_access_token({"sub": str(admin.id)})
+    db.close()
+    return token
+
+
+def _paths(n, count):
+    mix = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 3:
+            mix.append("/api/products/forecast")
+        elif kind == 2:
+            mix.append(f"/api/products?limit=50&cursor={(i * 7919) % n}")
+        else:
+            mix.append(f"/api/products/{1 + (i * 7919) % n}")
+    return mix
+
+
+async def _drive(app, paths, headers, concurrency):
+    import httpx
+
+    queue = list(reversed(paths))
+    codes = []
+
+    async def worker(client):
+        while queue:
+            r = await client.get(queue.pop(), headers=headers)
+            codes.append(r.status_code)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(paths[0], headers=headers)  # warm-up (pools, caches)
+        t0 = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - t0
+    return elapsed, codes
+
+
+def child(n, concurrency, count, token):
+    import main
+
+    paths = _paths(n, count)
+    elapsed, codes = asyncio.run(_drive(main.app, paths, {"Authorization": "Bearer " + token}, concurrency))
+    print(json.dumps({"rps": len(codes) / elapsed, "ok": codes.count(200), "errors": len(codes) - codes.count(200)}))
+
+
+def run(n, concurrency, count):
+    token = _seed(n)
+    print(f"{n} products, {concurrency} concurrent clients, {count} requests")
+    print(f"{'mode':>6} {'req/s':>9} {'ok':>6} {'errors':>7}")
+    for mode in ("sync", "async"):
+        env = dict(os.environ, DB_ASYNC="true" if mode == "async" else "false")
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(n), str(concurrency), str(count), token],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:>6} {result['rps']:>9.1f} {result['ok']:>6} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        args = sys.argv[sys.argv.index("--child") + 1:]
+        child(int(args[0]), int(args[1]), int(args[2]), args[3])
+    else:
+        args = [int(a) for a in sys.argv[1:]]
+        run(*(args + [1000, 64, 2000][len(args):]))
@@ -0,0 +1,69 @@
+# PUT /api/products/{id} latency vs catalog size.
+#
+#   python benchmarks/bench_update_product.py [sizes...]
+#
+# Grows one SQLite catalog through the sizes (default 100 -> 1M) and times
+# update_product through the in-process ASGI client at each size. With the
+# maintained catalog stats the median should stay flat; a full catalog scan
+# would grow linearly.
+
+import os, sys, statistics, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+from sqlalchemy import insert
+from fastapi.testclient import TestClient
+
+import models, auth, pricing_snapshot
+from database import SessionLocal
+from synthetic import generate_columns
+
+REQUESTS_PER_SIZE = 50
+INSERT_CHUNK = 50_000
+
+
+def _grow(db, start, stop):
+    cols = generate_columns(stop - start, seed=start)
+    keys = ["name", "description", "cost_price", "selling_price", "category",
+            "stock_available", "units_sold", "customer_rating", "demand_forecast", "optimized_price"]
+    rows = [dict(zip(keys, r)) for r in zip(*(cols[k].tolist() for k in keys))]
+    for i in range(0, len(rows), INSERT_CHUNK):
+        db.execute(insert(models.Product), rows[i:i + INSERT_CHUNK])
+    db.commit()
+
+
+def run(sizes):
+    import main  # creates tables
+
+    db = SessionLocal()
+    admin = models.User(username="bench", email="bench@demo.com", role=models.UserRole.admin,
+                        hashed_password=auth.hash_password("bench1234"), is_verified=True)
+    db.add(admin)
+    db.commit()
+    headers = {"Authorization": "Bearer " + auth.create_access_token({"sub": str(admin.id)})}
+
+    client = TestClient(main.app)
+    print(f"{'products':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    current = 0
+    for n in sizes:
+        _grow(db, current, n)
+        current = n
+        pricing_snapshot.rebuild(db, None, None, None)
+
+        timings = []
+        for i in range(REQUESTS_PER_SIZE):
+            product_id = 1 + (i * 7919) % n
+            t0 = time.perf_counter()
+            r = client.put(f"/api/products/{product_id}", headers=headers, json={"units_sold": 100 + i})
+            timings.append((time.perf_counter() - t0) * 1000)
+            assert r.status_code == 200, r.text
+        timings.sort()
+        print(f"{n:>10} {statistics.median(timings):>8.2f} {timings[int(len(timings) * 0.95) - 1]:>8.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 10_000, 100_000, 1_000_000]
+    run(sizes)
@@ -0,0 +1,56 @@
+# Synthetic product catalogs for the benchmarks.
+# Rows follow the product_data.csv schema so they can go through the same
+# code paths as the real data (ORM, seed, ml_model, pricing formulas).
+
+from collections import namedtuple
+import numpy as np
+
+CATEGORIES = ["Electronics", "Home Automation", "Outdoor & Sports", "Wearables",
+              "Kitchen", "Office", "Toys", "Beauty"]
+
+ADJECTIVES = ["Wireless", "Smart", "Portable", "Eco-Friendly", "Compact", "Premium", "Ergonomic",
+              "Rechargeable", "Waterproof", "Foldable", "Digital", "Classic", "Ultra", "Mini", "Pro"]
+NOUNS = ["Earbuds", "Speaker", "Water Bottle", "Desk Lamp", "Backpack", "Headphones", "Smartwatch",
+         "Keyboard", "Blender", "Scooter", "Tent", "Camera", "Charger", "Kettle", "Fitness Tracker"]
+
+CSV_COLUMNS = ["product_id", "name", "description", "cost_price", "selling_price", "category",
+               "stock_available", "units_sold", "customer_rating", "demand_forecast", "optimized_price"]
+
+# light-weight stand-in for models.Product (same attribute names)
+FakeProduct = namedtuple("FakeProduct", CSV_COLUMNS)
+
+
+def generate_columns(n, seed=42):
+    # Column arrays for n products - deterministic for a given seed
+    rng = np.random.default_rng(seed)
+    cost = np.round(rng.uniform(1, 500, n), 2)
+    selling = np.round(cost * rng.uniform(1.1, 2.5, n), 2)
+    stock = rng.integers(0, 5000, n)
+    units = rng.integers(0, 3000, n)
+    rating = np.round(rng.uniform(1, 5, n), 1)
+    adjectives = np.array(ADJECTIVES, dtype=object)[rng.integers(0, len(ADJECTIVES), n)]
+    nouns = np.array(NOUNS, dtype=object)[rng.integers(0, len(NOUNS), n)]
+    return {
+        "product_id": np.arange(1, n + 1),
+        "name": np.array([f"{a} {b} {i}" for i, (a, b) in enumerate(zip(adjectives, nouns), 1)], dtype=object),
+        "description": np.array([f"{a} {b.lower()} for everyday use, model {i}."
+                                 for i, (a, b) in enumerate(zip(adjectives, nouns), 1)], dtype=object),
+        "cost_price": cost,
+        "selling_price": selling,
+        "category": np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), n)],
+        "stock_available": stock,
+        "units_sold": units,
+        "customer_rating": rating,
+        "demand_forecast": np.round(units * rng.uniform(0.8, 1.5, n), 2),
+        "optimized_price": selling,
+    }
+
+
+def generate_products(n, seed=42):
+    cols = generate_columns(n, seed)
+    return [FakeProduct(*row) for row in zip(*(cols[c].tolist() for c in CSV_COLUMNS))]
+
+
+def generate_dataframe(n, seed=42):
+    import pandas as pd
+    return pd.DataFrame(generate_columns(n, seed), columns=CSV_COLUMNS)
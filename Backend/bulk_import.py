@@ -0,0 +1,271 @@
+# Bulk product import (CSV / Parquet), used by POST /api/products/bulk and
+# as a CLI for the nightly feed:
+#
+#   python bulk_import.py feed.csv [--upsert-key product_id|name] [--chunk-size 50000]
+#
+# The file is streamed in chunks, each chunk is validated with
+# schemas.ProductCreate, demand_forecast / optimized_price are computed with
+# the array versions of the pricing formulas and rows are written with Core
+# executemany inserts (COPY on PostgreSQL when there's no upsert key).
+# With an upsert key, the last row for a key in a chunk wins (earlier ones
+# are reported as rejected) and updated rows move the running catalog demand
+# by their delta. The whole file is one transaction: the pricing snapshot is
+# rebuilt once at the end (under the model lock) and commits it, so a failure
+# mid-file leaves nothing behind.
+
+import argparse
+import csv
+import io
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, text, update
+from sqlalchemy.orm import Session
+
+import models, schemas
+import online_model
+import pricing_snapshot
+from ml_model import model_lock, registry
+from pricing import compute_demand_forecast_array, compute_optimized_price_array
+
+DEFAULT_CHUNK_SIZE = 50_000
+UPSERT_KEYS = ("product_id", "name")
+MAX_REPORTED_ERRORS = 50
+
+_PRODUCT_FIELDS = list(schemas.ProductCreate.model_fields)
+_chunk_adapter = TypeAdapter(List[schemas.ProductCreate])
+
+
+def detect_format(filename: str) -> str:
+    return "parquet" if filename.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def iter_chunks(source, fmt: str = "csv", chunk_size: int = DEFAULT_CHUNK_SIZE):
+    # yields DataFrames of at most chunk_size rows, never the whole file
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet import needs pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_size, encoding="utf-8-sig")
+
+
+def _validate_chunk(df: pd.DataFrame, first_row: int, errors: list):
+    # returns (valid ProductCreate list, their positions in df)
+    present = [c for c in _PRODUCT_FIELDS if c in df.columns]
+    records = df[present].astype(object).where(df[present].notna(), None).to_dict("records")
+    try:
+        return _chunk_adapter.validate_python(records), list(range(len(records)))
+    except ValidationError:
+        pass
+
+    # slow path only for chunks with bad rows - find out which ones
+    valid, positions = [], []
+    for i, rec in enumerate(records):
+        try:
+            valid.append(schemas.ProductCreate.model_validate(rec))
+            positions.append(i)
+        except ValidationError as e:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                err = e.errors(include_url=False)[0]
+                field = ".".join(str(part) for part in err["loc"])
+                errors.append({"row": first_row + i, "error": f"{field}: {err['msg']}"})
+    return valid, positions
+
+
+def _dedupe(rows: list, key: str, row_numbers: list, errors: list) -> list:
+    # the last row for a key wins, earlier ones are rejected
+    last = {row[key]: i for i, row in enumerate(rows) if row[key] is not None}
+    kept = []
+    for i, row in enumerate(rows):
+        if row[key] is not None and last[row[key]] != i:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_numbers[i],
+                               "error": f"{key}: duplicate, row {row_numbers[last[row[key]]]} is imported instead"})
+            continue
+        kept.append(row)
+    return kept
+
+
+def _existing(db: Session, key: str, values) -> dict:
+    # natural key value -> (product_id, its catalog demand, sales history
+    # demand or None) for rows already in the table
+    column = getattr(models.Product, key)
+    rows = []
+    values = list(values)
+    for i in range(0, len(values), 1000):
+        rows += db.query(
+            column.label("key"), models.Product.product_id, models.Product.units_sold,
+            models.Product.stock_available, models.SalesForecast.demand.label("sales_demand"),
+        ).outerjoin(
+            models.SalesForecast, models.SalesForecast.product_id == models.Product.product_id
+        ).filter(column.in_(values[i:i + 1000])).all()
+    formula = compute_demand_forecast_array([r.units_sold for r in rows], [r.stock_available for r in rows])
+    existing = {}
+    for r, f in zip(rows, formula.tolist()):
+        sales = None if r.sales_demand is None else float(r.sales_demand)
+        existing[r.key] = (r.product_id, f if sales is None else sales, sales)
+    return existing
+
+
+def _copy_insert(db: Session, rows: list):
+    # PostgreSQL COPY FROM STDIN - much faster than INSERT for large batches
+    columns = list(rows[0])
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in rows:
+        writer.writerow(["" if r[c] is None else r[c] for c in columns])
+    buf.seek(0)
+    cursor = db.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY products ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')", buf
+    )
+
+
+def import_products(db: Session, source, fmt: str = "csv", upsert_key: Optional[str] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, created_by: Optional[int] = None) -> dict:
+    if upsert_key is not None and upsert_key not in UPSERT_KEYS:
+        raise ValueError(f"upsert_key must be one of {UPSERT_KEYS}")
+
+    started = time.perf_counter()
+    use_copy = upsert_key is None and db.get_bind().dialect.name == "postgresql"
+
+    # running catalog demand sum/count so each chunk is priced against the
+    # catalog average including the rows imported so far (rebuilt first if
+    # products were loaded behind the snapshot's back, e.g. seed.py)
+    pricing_snapshot.ensure_fresh(db)
+    stats = pricing_snapshot.get_stats(db)
+    demand_sum, demand_count = stats.demand_sum or 0.0, stats.demand_count or 0
+
+    rows_read = inserted = updated = 0
+    errors = []
+
+    for df in iter_chunks(source, fmt, chunk_size):
+        first_row = rows_read
+        rows_read += len(df)
+        products, positions = _validate_chunk(df, first_row, errors)
+        if not products:
+            continue
+
+        rows = [dict(p.model_dump(), created_by=created_by) for p in products]
+        existing = {}
+        if upsert_key is not None:
+            if upsert_key == "product_id":
+                if "product_id" not in df.columns:
+                    raise ValueError("upsert by product_id needs a product_id column")
+                ids = df["product_id"].to_numpy()[positions]
+                for row, pid in zip(rows, ids.tolist()):
+                    row["product_id"] = int(pid) if pd.notna(pid) else None
+            rows = _dedupe(rows, upsert_key, [first_row + i for i in positions], errors)
+            existing = _existing(db, upsert_key, {r[upsert_key] for r in rows if r[upsert_key] is not None})
+        matches = [existing.get(r[upsert_key]) if upsert_key is not None else None for r in rows]
+
+        units = np.array([r["units_sold"] for r in rows], dtype=float)
+        stock = np.array([r["stock_available"] for r in rows], dtype=float)
+        cost = np.array([r["cost_price"] for r in rows], dtype=float)
+        selling = np.array([r["selling_price"] for r in rows], dtype=float)
+        # rows with a sales history forecast keep its demand (sales_forecast.demand_for)
+        forecasts = np.array([
+            f if m is None or m[2] is None else m[2]
+            for f, m in zip(compute_demand_forecast_array(units, stock).tolist(), matches)
+        ])
+
+        # updates replace their old demand, inserts add one
+        demand_sum += float(forecasts.sum()) - sum(m[1] for m in matches if m is not None)
+        demand_count += sum(1 for m in matches if m is None)
+        # empty catalog so far (or nothing counted yet): the chunk's own mean
+        avg_demand = demand_sum / demand_count if demand_count > 0 else float(forecasts.mean())
+        prices = compute_optimized_price_array(cost, selling, forecasts, avg_demand)
+
+        for row, f, price in zip(rows, forecasts.tolist(), prices.tolist()):
+            row.update(demand_forecast=f, optimized_price=price)
+
+        if upsert_key is None:
+            if use_copy:
+                _copy_insert(db, rows)
+            else:
+                db.execute(insert(models.Product), rows)
+            inserted += len(rows)
+        else:
+            to_update, to_insert = [], []
+            for row, match in zip(rows, matches):
+                if match is None:
+                    if row.get("product_id") is None:
+                        row.pop("product_id", None)
+                    to_insert.append(row)
+                else:
+                    row["product_id"] = match[0]
+                    row.pop("created_by")  # keep the original owner
+                    to_update.append(row)
+            if to_insert:
+                db.execute(insert(models.Product), to_insert)
+            if to_update:
+                # bulk UPDATE by primary key
+                db.execute(update(models.Product), to_update)
+            inserted += len(to_insert)
+            updated += len(to_update)
+
+    if upsert_key == "product_id" and db.get_bind().dialect.name == "postgresql":
+        # explicit ids were inserted, move the serial past them
+        db.execute(text(
+            "SELECT setval(pg_get_serial_sequence('products', 'product_id'), "
+            "(SELECT COALESCE(MAX(product_id), 1) FROM products))"
+        ))
+
+    # one full pass for forecasts / prices / exact catalog stats - commits the
+    # import together with the snapshot, serialized with training workers
+    with model_lock:
+        registry.load()
+        model, scaler = registry.get()
+        pricing_snapshot.rebuild(db, model, scaler, registry.version)
+        online_model.reset(db)
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows_read": rows_read,
+        "inserted": inserted,
+        "updated": updated,
+        "rejected": rows_read - inserted - updated,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows_read / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import products from CSV / Parquet")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "parquet"))
+    parser.add_argument("--upsert-key", choices=UPSERT_KEYS)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--created-by", type=int)
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+    registry.load()
+
+    db = SessionLocal()
+    try:
+        result = import_products(
+            db, args.path, args.format or detect_format(args.path),
+            upsert_key=args.upsert_key, chunk_size=args.chunk_size, created_by=args.created_by,
+        )
+    finally:
+        db.close()
+
+    print(f"Read {result['rows_read']} rows: {result['inserted']} inserted, "
+          f"{result['updated']} updated, {result['rejected']} rejected "
+          f"in {result['seconds']}s ({result['rows_per_second']} rows/s)")
+    for err in result["errors"]:
+        print(f"  row {err['row']}: {err['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
 import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 from dotenv import load_dotenv
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models
 
 load_dotenv()
 
@@ -9,15 +19,24 @@ SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 SENDGRID_FROM_EMAIL = os.getenv("SENDGRID_FROM_EMAIL")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
+# "sendgrid" or "fake" (no network, for local runs and load tests - opt-in
+# only, without SENDGRID_API_KEY the sender just isn't started)
+EMAIL_PROVIDER = os.getenv("EMAIL_PROVIDER", "sendgrid")
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+EMAIL_SEND_CONCURRENCY = int(os.getenv("EMAIL_SEND_CONCURRENCY", 8))  # provider calls in flight per batch
+EMAIL_CLAIM_SECONDS = float(os.getenv("EMAIL_CLAIM_SECONDS", 300))  # a crashed sender's batch is retried after this
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", 2))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 6))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))  # 30s, 60s, 120s ...
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", 3600))
+# run the outbox sender thread in this process (turn off for API-only workers)
+EMAIL_SENDER_ENABLED = os.getenv("EMAIL_SENDER_ENABLED", "true").lower() in ("1", "true", "yes")
 
-def send_verification_email(to_email: str, username: str, token: str):
-    verification_link = f"{FRONTEND_URL}/verify-email?token={token}"
 
-    message = Mail(
-        from_email=SENDGRID_FROM_EMAIL,
-        to_emails=to_email,
-        subject="Verify your Price Optimization Tool account",
-        html_content=f"""
+def build_verification_email(username: str, token: str):
+    verification_link = f"{FRONTEND_URL}/verify-email?token={token}"
+    subject = "Verify your Price Optimization Tool account"
+    html_content = f"""
         <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
             <h2 style="color: #00D4AA;">Price Optimization Tool</h2>
             <p>Hi <strong>{username}</strong>,</p>
@@ -36,12 +55,193 @@ def send_verification_email(to_email: str, username: str, token: str):
             </p>
         </div>
         """
-    )
-
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        sg.send(message)
-        print(f"Verification email sent to {to_email}")
-    except Exception as e:
-        print(f"Email send failed: {e}")
-        raise
\ No newline at end of file
+    return subject, html_content
+
+
+# Providers
+
+class SendGridProvider:
+    def __init__(self):
+        check_config("sendgrid")
+        # one client for the life of the process instead of one per email
+        self.client = SendGridAPIClient(SENDGRID_API_KEY)
+
+    def send(self, to_email: str, subject: str, html_content: str):
+        message = Mail(from_email=SENDGRID_FROM_EMAIL, to_emails=to_email,
+                       subject=subject, html_content=html_content)
+        self.client.send(message)
+
+
+class FakeProvider:
+    # Keeps the last EMAIL_FAKE_KEEP sent emails in memory (and a count of all).
+    # EMAIL_FAKE_LATENCY_MS / EMAIL_FAKE_FAILURE_RATE simulate a slow or flaky
+    # provider for load tests
+    def __init__(self):
+        self.latency = float(os.getenv("EMAIL_FAKE_LATENCY_MS", 0)) / 1000
+        self.failure_rate = float(os.getenv("EMAIL_FAKE_FAILURE_RATE", 0))
+        self.sent = deque(maxlen=int(os.getenv("EMAIL_FAKE_KEEP", 1000)))
+        self.sent_count = 0
+
+    def send(self, to_email: str, subject: str, html_content: str):
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("fake provider failure")
+        self.sent.append((to_email, subject))
+        self.sent_count += 1
+
+
+def check_config(name: str = EMAIL_PROVIDER):
+    # at startup (main.py), before the outbox sender is started
+    if name not in ("sendgrid", "fake"):
+        raise ValueError(f"Unknown EMAIL_PROVIDER '{name}'")
+    if name == "sendgrid" and not SENDGRID_API_KEY:
+        raise RuntimeError("EMAIL_PROVIDER=sendgrid needs SENDGRID_API_KEY "
+                           "(EMAIL_PROVIDER=fake to send nothing in local runs)")
+
+
+def make_provider(name: str = EMAIL_PROVIDER):
+    if name == "sendgrid":
+        return SendGridProvider()
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown EMAIL_PROVIDER '{name}'")
+
+
+# Outbox
+
+def enqueue_email(db: Session, to_email: str, subject: str, html_content: str) -> models.EmailOutbox:
+    # added to the caller's transaction - sent once it commits
+    email = models.EmailOutbox(to_email=to_email, subject=subject, html_content=html_content,
+                               next_attempt_at=_utcnow())
+    db.add(email)
+    return email
+
+
+def enqueue_verification_email(db: Session, to_email: str, username: str, token: str) -> models.EmailOutbox:
+    subject, html_content = build_verification_email(username, token)
+    return enqueue_email(db, to_email, subject, html_content)
+
+
+def _utcnow():
+    # naive UTC, like the TIMESTAMP columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def retry_delay(attempts: int) -> float:
+    return min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+class OutboxSender:
+    # Background thread draining email_outbox in batches:
+    # - claim: FOR UPDATE SKIP LOCKED (PostgreSQL), so several workers can run
+    #   a sender without sending the same email twice. Claimed rows get their
+    #   attempt counted and next_attempt_at pushed EMAIL_CLAIM_SECONDS ahead,
+    #   then the claim commits - no transaction is open while sending, and a
+    #   sender that dies mid-batch only delays those emails
+    # - send: up to EMAIL_SEND_CONCURRENCY provider calls at once
+    # - mark: one bulk UPDATE with the results (sent / retry later / dead)
+
+    def __init__(self, session_factory, provider=None):
+        self.session_factory = session_factory
+        self.provider = provider
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def start(self):
+        if self._thread is None:
+            if self.provider is None:
+                self.provider = make_provider()
+            self._thread = threading.Thread(target=self._loop, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def wake(self):
+        # called after a commit that enqueued emails, skips the poll wait
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.send_batch()
+            except Exception as e:
+                print(f"Email outbox error: {e}")
+                sent = 0
+            if sent < EMAIL_BATCH_SIZE:  # drained, wait for more
+                self._wake.wait(EMAIL_POLL_INTERVAL)
+                self._wake.clear()
+
+    def _claim(self) -> list:
+        db = self.session_factory()
+        try:
+            now = _utcnow()
+            batch = db.query(models.EmailOutbox).filter(
+                models.EmailOutbox.status == models.EmailStatus.pending,
+                models.EmailOutbox.next_attempt_at <= now,
+            ).order_by(models.EmailOutbox.next_attempt_at).limit(EMAIL_BATCH_SIZE).with_for_update(
+                skip_locked=True
+            ).all()
+            claimed = []
+            for email in batch:
+                email.attempts += 1
+                email.next_attempt_at = now + timedelta(seconds=EMAIL_CLAIM_SECONDS)
+                claimed.append((email.id, email.to_email, email.subject, email.html_content, email.attempts))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _send(self, email):
+        # -> None if sent, else the exception
+        _, to_email, subject, html_content, _ = email
+        try:
+            self.provider.send(to_email, subject, html_content)
+        except Exception as e:
+            return e
+        return None
+
+    def send_batch(self) -> int:
+        # returns how many emails were attempted
+        if self.provider is None:
+            self.provider = make_provider()
+        claimed = self._claim()
+        if not claimed:
+            return 0
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max(1, EMAIL_SEND_CONCURRENCY), thread_name_prefix="email-send")
+        errors = list(self._pool.map(self._send, claimed))
+
+        rows = []
+        for (email_id, to_email, _, _, attempts), e in zip(claimed, errors):
+            if e is None:
+                rows.append({"id": email_id, "status": models.EmailStatus.sent,
+                             "sent_at": _utcnow(), "last_error": None})
+            elif attempts >= EMAIL_MAX_ATTEMPTS:
+                rows.append({"id": email_id, "status": models.EmailStatus.dead, "last_error": str(e)[:1000]})
+                print(f"Email {email_id} to {to_email} dead-lettered: {e}")
+            else:
+                rows.append({"id": email_id, "last_error": str(e)[:1000],
+                             "next_attempt_at": _utcnow() + timedelta(seconds=retry_delay(attempts))})
+        db = self.session_factory()
+        try:
+            # bulk UPDATE by primary key, grouped by the columns each row sets
+            for keys in {tuple(r) for r in rows}:
+                db.execute(update(models.EmailOutbox), [r for r in rows if tuple(r) == keys])
+            db.commit()
+        finally:
+            db.close()
+        return len(claimed)
+
+
+outbox = OutboxSender(SessionLocal)
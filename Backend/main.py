@@ -1,18 +1,77 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine
+from database import engine, async_engine, SessionLocal, DB_ASYNC
 import models
+import ml_model
+import training_jobs
+import pricing_snapshot
+import auth
+import email_service
+import metrics
 import os
+from alembic import command
+from alembic.config import Config
 from dotenv import load_dotenv
-from routes import auth_routes, product_routes, user_routes
+from routes import auth_routes, product_routes, user_routes, model_routes, sales_routes, metrics_routes
+from routes import async_auth_routes, async_product_routes, async_user_routes
 
 load_dotenv()
 
-models.Base.metadata.create_all(bind=engine)
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def run_migrations():
+    # alembic upgrade head on our engine (revisions in migrations/versions)
+    config = Config(ALEMBIC_INI)
+    with engine.begin() as conn:
+        config.attributes["connection"] = conn
+        command.upgrade(config, "head")
+
+
+# several workers start at once: one at a time creates the tables / migrates
+with ml_model.model_lock:
+    models.Base.metadata.create_all(bind=engine)
+    run_migrations()
 
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
 
-app = FastAPI(title="Price Optimization Tool", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # bcrypt workers first, before this process starts any threads
+    auth.hash_pool.start()
+
+    # Load the demand model once per process, requests only read the registry.
+    # First boot without a saved model kicks off a background training job
+    # (which also builds the pricing snapshot) - with several workers the
+    # first one trains, the others' jobs find its model and just load it
+    if ml_model.registry.load():
+        db = SessionLocal()
+        try:
+            pricing_snapshot.ensure_fresh(db)
+        finally:
+            db.close()
+    else:
+        training_jobs.submit_training(if_missing=True)
+    # without a usable email provider the sender stays off and emails wait
+    # in the outbox (local runs / CI without SENDGRID_API_KEY)
+    if email_service.EMAIL_SENDER_ENABLED:
+        try:
+            email_service.check_config()
+        except (ValueError, RuntimeError) as e:
+            print(f"Email outbox sender not started, emails stay queued: {e}")
+        else:
+            email_service.outbox.start()
+    yield
+    email_service.outbox.stop()
+    training_jobs.shutdown()
+    auth.hash_pool.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+app = FastAPI(title="Price Optimization Tool", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,11 +79,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
-app.include_router(auth_routes.router)
-app.include_router(product_routes.router)
-app.include_router(user_routes.router)
+# latency / stage / SQL metrics on GET /metrics, Server-Timing on every response
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(metrics_routes.router)
+
+# DB_ASYNC=true: same endpoints served by async handlers on the AsyncEngine
+if DB_ASYNC:
+    app.include_router(async_auth_routes.router)
+    app.include_router(async_product_routes.router)
+    app.include_router(async_user_routes.router)
+else:
+    app.include_router(auth_routes.router)
+    app.include_router(product_routes.router)
+    app.include_router(user_routes.router)
+app.include_router(model_routes.router)
+app.include_router(sales_routes.router)
 
 @app.get("/", include_in_schema=False)
 def root():
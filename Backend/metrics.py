@@ -0,0 +1,323 @@
+# Request metrics + hot path stage timings, exposed in Prometheus text format
+# on GET /metrics (routes/metrics_routes.py).
+#
+# - MetricsMiddleware times every request (histogram per method / route
+#   template / status) and opens a Trace for it
+# - stage(handler, name) / @timed time a piece of a handler (db fetch,
+#   inference, serialization ...) into a histogram and into the request's
+#   Trace, which is sent back as a Server-Timing header
+# - every SQL statement is counted (and timed) on the Trace through a
+#   SQLAlchemy cursor event, so the per-request query count is a histogram too
+# - PROFILE_SLOW_MS > 0 turns on a sampling profiler: while a request runs,
+#   a background thread samples the stacks of the process every
+#   PROFILE_INTERVAL_MS, and requests slower than the threshold get their
+#   samples dumped to PROFILE_DIR as collapsed stacks (flamegraph.pl /
+#   speedscope input). It samples every thread, so concurrent requests show up
+#   in each other's dumps.
+#
+# No client library, the registry is a few dicts behind a lock.
+
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 0))  # 0 = profiler off
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, series in items:
+            labels = _labels(self.labels, label_values)
+            for bound, count in zip(self.buckets, series):
+                yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {series[-1]}'
+            yield f"{self.name}_sum{{{labels}}} {series[-2]}"
+            yield f"{self.name}_count{{{labels}}} {series[-1]}"
+
+
+class CounterMetric:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *label_values):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{{{_labels(self.labels, label_values)}}} {value}"
+
+
+class GaugeMetric:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, amount: float, *label_values):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{{{_labels(self.labels, label_values)}}} {value}"
+
+
+def _labels(names, values) -> str:
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{n}="{escape(v)}"' for n, v in zip(names, values))
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency",
+                            ("method", "route", "status"), LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram("handler_stage_duration_seconds", "Time spent in one stage of a handler",
+                          ("handler", "stage"), LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram("http_request_sql_queries", "SQL statements executed per request",
+                            ("route",), QUERY_BUCKETS)
+SQL_QUERIES = CounterMetric("sql_queries_total", "SQL statements executed", ("route",))
+SQL_SECONDS = CounterMetric("sql_query_seconds_total", "Time spent executing SQL statements", ("route",))
+SLOW_PROFILES = CounterMetric("slow_request_profiles_total", "Slow requests dumped by the sampling profiler",
+                              ("route",))
+# bcrypt process pool (auth.HashPool): in flight / queue_limit is its saturation
+HASH_POOL_IN_FLIGHT = GaugeMetric("hash_pool_in_flight", "Password hashes queued or running on the bcrypt pool")
+HASH_POOL_QUEUE_LIMIT = GaugeMetric("hash_pool_queue_limit", "Bcrypt pool queue depth limit (429 beyond it)")
+HASH_POOL_REJECTED = CounterMetric("hash_pool_rejected_total", "Hash requests rejected with 429 by the bcrypt pool", ())
+ALL_METRICS = (REQUEST_SECONDS, STAGE_SECONDS, REQUEST_QUERIES, SQL_QUERIES, SQL_SECONDS, SLOW_PROFILES,
+               HASH_POOL_IN_FLIGHT, HASH_POOL_QUEUE_LIMIT, HASH_POOL_REJECTED)
+
+
+def render() -> str:
+    return "\n".join(line for metric in ALL_METRICS for line in metric.render()) + "\n"
+
+
+# Per-request trace
+
+class Trace:
+    def __init__(self):
+        self.stages = defaultdict(float)  # "handler.stage" -> seconds
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+
+_current: ContextVar = ContextVar("metrics_trace", default=None)
+
+
+@contextmanager
+def trace():
+    # collects stages / SQL of everything run in this context (threadpool and
+    # run_sync calls copy the context, so they land on the same Trace)
+    current = Trace()
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(handler: str, name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, handler, name)
+        current = _current.get()
+        if current is not None:
+            current.stages[f"{handler}.{name}"] += seconds
+
+
+def record_stages(stages: dict):
+    # stages timed in another process (the training worker)
+    for key, seconds in stages.items():
+        handler, name = key.split(".", 1)
+        STAGE_SECONDS.observe(seconds, handler, name)
+
+
+def timed(handler: str, name: str = "total"):
+    # decorator version of stage() for sync and async functions
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(handler, name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(handler, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current.get()
+    started = conn.info.get("metrics_started")
+    if current is not None and started:
+        current.queries += 1
+        current.sql_seconds += time.perf_counter() - started.pop()
+
+
+# Sampling profiler
+
+class SamplingProfiler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._sessions = {}  # id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self) -> int:
+        samples = Counter()
+        with self._lock:
+            self._sessions[id(samples)] = samples
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return id(samples)
+
+    def stop(self, session: int) -> Counter:
+        with self._lock:
+            return self._sessions.pop(session, Counter())
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            stacks = [_collapse(frame) for ident, frame in sys._current_frames().items() if ident != own]
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                for samples in self._sessions.values():
+                    samples.update(stacks)
+            time.sleep(self.interval)
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000)
+
+
+def _dump_profile(route: str, seconds: float, samples: Counter):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{int(seconds * 1000)}ms.txt")
+    with open(path, "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+# Middleware
+
+class MetricsMiddleware:
+    # pure ASGI (no BaseHTTPMiddleware), so streamed responses pass through untouched
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None  # endpoint -> route template
+
+    def _route(self, scope) -> str:
+        if self._routes is None:
+            self._routes = {getattr(r, "endpoint", None): r.path for r in scope["app"].routes}
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        session = profiler.start() if PROFILE_SLOW_MS > 0 else None
+        started = time.perf_counter()
+
+        with trace() as current:
+            async def send_with_timing(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    timings = [f"{key};dur={seconds * 1000:.2f}" for key, seconds in current.stages.items()]
+                    timings.append(f"sql;dur={current.sql_seconds * 1000:.2f};desc=\"{current.queries} queries\"")
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", ", ".join(timings).encode())
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                seconds = time.perf_counter() - started
+                route = self._route(scope)
+                REQUEST_SECONDS.observe(seconds, scope["method"], route, status)
+                REQUEST_QUERIES.observe(current.queries, route)
+                SQL_QUERIES.inc(current.queries, route)
+                SQL_SECONDS.inc(current.sql_seconds, route)
+                if session is not None:
+                    samples = profiler.stop(session)
+                    if seconds * 1000 >= PROFILE_SLOW_MS and samples:
+                        SLOW_PROFILES.inc(1, route)
+                        _dump_profile(route, seconds, samples)
@@ -0,0 +1,37 @@
+"""product search indexes (PostgreSQL only)
+
+Revision ID: 0001_product_search_indexes
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0001_product_search_indexes"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# must stay the exact expression search.py queries (SEARCH_DOCUMENT_SQL /
+# SEARCH_TSVECTOR_SQL) or PostgreSQL won't use the indexes
+SEARCH_DOCUMENT_SQL = "coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(category, '')"
+SEARCH_TSVECTOR_SQL = f"to_tsvector('simple', {SEARCH_DOCUMENT_SQL})"
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # ranked full text search
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_products_search_tsv ON products USING gin (({SEARCH_TSVECTOR_SQL}))")
+    # fuzzy (trigram word similarity) search over the same document
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_products_search_trgm ON products USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops)")
+    # name ILIKE '%x%' (list_products) and prefix autocomplete
+    op.execute("CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_products_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_products_search_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_products_search_tsv")
@@ -0,0 +1,25 @@
+"""users.token_version
+
+Revision ID: 0002_users_token_version
+Revises: 0001_product_search_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_users_token_version"
+down_revision = "0001_product_search_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # fresh databases already get it from create_all()
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("users")}
+    if "token_version" not in columns:
+        op.add_column("users", sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("token_version")
@@ -0,0 +1,26 @@
+"""sales_events.sold_at BRIN index (PostgreSQL only)
+
+Revision ID: 0003_sales_events_brin
+Revises: 0002_users_token_version
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003_sales_events_brin"
+down_revision = "0002_users_token_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # append-only, so sold_at follows the physical order: a BRIN index
+    # is a few pages for any number of events (time range scans / purges)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_sales_events_sold_at_brin ON sales_events USING brin (sold_at)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_sales_events_sold_at_brin")
@@ -0,0 +1,26 @@
+"""sales_forecasts.demand (sales forecast on the formula's demand scale)
+
+Revision ID: 0004_sales_forecasts_demand
+Revises: 0003_sales_events_brin
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_sales_forecasts_demand"
+down_revision = "0003_sales_events_brin"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # left NULL on existing rows: those products are priced with the formula
+    # until the next POST /api/sales/forecast/refresh fills it in
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("sales_forecasts")}
+    if "demand" not in columns:
+        op.add_column("sales_forecasts", sa.Column("demand", sa.Numeric(12, 2), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("sales_forecasts") as batch:
+        batch.drop_column("demand")
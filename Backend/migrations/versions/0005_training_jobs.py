@@ -0,0 +1,34 @@
+"""training_jobs table (job status shared by all server workers)
+
+Revision ID: 0005_training_jobs
+Revises: 0004_sales_forecasts_demand
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_training_jobs"
+down_revision = "0004_sales_forecasts_demand"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # fresh databases already get it from create_all()
+    if sa.inspect(op.get_bind()).has_table("training_jobs"):
+        return
+    op.create_table(
+        "training_jobs",
+        sa.Column("job_id", sa.String(32), primary_key=True),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(), nullable=False),
+        sa.Column("finished_at", sa.TIMESTAMP()),
+        sa.Column("model_version", sa.String(40)),
+        sa.Column("error", sa.Text()),
+    )
+    op.create_index("ix_training_jobs_created_at", "training_jobs", ["created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_training_jobs_created_at", table_name="training_jobs")
+    op.drop_table("training_jobs")
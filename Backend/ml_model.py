@@ -1,12 +1,50 @@
 import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
-import pickle
+import glob
+import io
+import json
 import os
+import struct
+import threading
+import time
+import zipfile
 
-# Path to save trained model
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "demand_model.pkl")
-SCALER_PATH = os.path.join(os.path.dirname(__file__), "demand_scaler.pkl")
+try:
+    import fcntl
+except ImportError:  # Windows: the model lock only works within one process
+    fcntl = None
+
+import metrics
+
+# Trained models are saved as versioned .npz artifacts (plain arrays, no
+# pickle): demand_model.<version>.npz in MODEL_DIR, see save_model
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.dirname(__file__))
+# written last, after the artifact - points at the active version, readers
+# only reload when this changes
+VERSION_PATH = os.path.join(MODEL_DIR, "demand_model.version")
+# artifacts kept for rollback, per source (training / online / ...) - the
+# active one is never pruned
+MODEL_KEEP_VERSIONS = max(int(os.getenv("MODEL_KEEP_VERSIONS", 5)), 2)
+# held while training / publishing a model and rebuilding the pricing snapshot,
+# so with several workers (or instances sharing MODEL_DIR) only one does it
+LOCK_PATH = os.path.join(MODEL_DIR, "demand_model.lock")
+# memory-map the arrays read-only instead of reading them: every worker maps
+# the same artifact, so the coefficients live once in the page cache
+MODEL_MMAP = os.getenv("MODEL_MMAP", "true").lower() in ("1", "true", "yes")
+ARTIFACT_FORMAT = 1
+
+# how often (seconds) the registry stats VERSION_PATH for a newer model
+MODEL_CHECK_INTERVAL = float(os.getenv("MODEL_CHECK_INTERVAL", 5))
+
+# "category": one model per category (global fallback for small ones), "global": a single model
+MODEL_SEGMENTS = os.getenv("MODEL_SEGMENTS", "category")
+MIN_SEGMENT_SIZE = int(os.getenv("MIN_SEGMENT_SIZE", 50))
+TRAIN_JOBS = int(os.getenv("TRAIN_JOBS", -1))  # joblib n_jobs, -1 = all cores
+
+FEATURES = ("cost_price", "selling_price", "stock_available", "units_sold", "customer_rating")
 
 def prepare_features(products):
     # Converting product list to feature matrix
@@ -23,53 +61,392 @@ def prepare_features(products):
     return np.array(X)
 
 
+class SegmentedModel:
+    # One scaler + LinearRegression per category, with the global model for
+    # categories that had fewer than MIN_SEGMENT_SIZE products (and unknown
+    # ones). Saved as a single artifact under one version; scaler/model
+    # are the global pair so it can stand in wherever those are used.
+
+    def __init__(self, scaler, model, segments: dict):
+        self.scaler = scaler
+        self.model = model
+        self.segments = segments  # category -> (scaler, model)
+
+    def predict(self, X: np.ndarray, categories=None) -> np.ndarray:
+        # routes each row to its segment's model, one predict call per segment
+        out = self.model.predict(self.scaler.transform(X)) if len(X) else np.empty(0)
+        if categories is None or not self.segments:
+            return out
+        for category, rows in segment_rows(categories).items():
+            if category in self.segments:
+                scaler, model = self.segments[category]
+                out[rows] = model.predict(scaler.transform(X[rows]))
+        return out
+
+
+def segment_rows(categories) -> dict:
+    # category -> row indices in one pass (rows without a category are left out)
+    codes, names = pd.factorize(np.asarray(categories, dtype=object))
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    return {name: order[bounds[i]:bounds[i + 1]] for i, name in enumerate(names)}
+
+
+def predict_matrix(X: np.ndarray, model, scaler, categories=None) -> np.ndarray:
+    # raw model output for a feature matrix (no rounding / clipping)
+    if isinstance(model, SegmentedModel):
+        return model.predict(X, categories)
+    return model.predict(scaler.transform(X))
+
+
+def _fit(X, y):
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    return scaler, LinearRegression().fit(X_scaled, y)
+
+
+def fit_segmented(X: np.ndarray, y: np.ndarray, categories, n_jobs: int = TRAIN_JOBS,
+                  min_segment_size: int = MIN_SEGMENT_SIZE) -> SegmentedModel:
+    # global model + one per large enough category, fitted across a joblib process pool
+    large = {name: rows for name, rows in segment_rows(categories).items() if len(rows) >= min_segment_size}
+    jobs = [(X, y)] + [(X[rows], y[rows]) for rows in large.values()]
+    fitted = Parallel(n_jobs=n_jobs)(delayed(_fit)(X_seg, y_seg) for X_seg, y_seg in jobs)
+    (scaler, model), segments = fitted[0], dict(zip(large, fitted[1:]))
+    return SegmentedModel(scaler, model, segments)
+
+
+@metrics.timed("train_model")
 def train_model(db):
     # Now we Train Linear Regression on existing product data 
     from models import Product
 
-    products = db.query(Product).all()
+    # only the columns the model needs, not full ORM objects
+    data_at = time.time()  # data snapshot time, see trained_since
+    with metrics.stage("train_model", "db"):
+        products = db.query(
+            Product.cost_price, Product.selling_price, Product.stock_available,
+            Product.units_sold, Product.customer_rating, Product.demand_forecast, Product.category,
+        ).all()
 
     if len(products) < 3:
         print("Not enough data to train model")
         return None, None
 
-    X = prepare_features(products)
+    with metrics.stage("train_model", "features"):
+        X = prepare_features(products)
 
-    y = np.array([
-        float(p.demand_forecast) if p.demand_forecast else float(p.units_sold)
-        for p in products
-    ])
+        y = np.array([
+            float(p.demand_forecast) if p.demand_forecast else float(p.units_sold)
+            for p in products
+        ])
+        categories = [p.category for p in products]
 
-    # Scale features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    started = time.perf_counter()
+    with metrics.stage("train_model", "fit"):
+        if MODEL_SEGMENTS == "category":
+            model = fit_segmented(X, y, categories)
+            scaler = model.scaler
+        else:
+            scaler, model = _fit(X, y)
+    seconds = time.perf_counter() - started
+
+    # Save model and scaler (one artifact)
+    with metrics.stage("train_model", "save"):
+        version = save_model(model, scaler, source="training", samples=len(products), data_at=data_at)
+    registry.publish(model, scaler, version)
+
+    with metrics.stage("train_model", "evaluate"):
+        predictions = predict_matrix(X, model, scaler, categories)
+        r2 = 1 - ((y - predictions) ** 2).sum() / max(((y - y.mean()) ** 2).sum(), 1e-12)
+    segments = len(model.segments) if isinstance(model, SegmentedModel) else 0
+    print(f"ML model trained on {len(products)} products (version {version})")
+    print(f"  {segments} category models + global, {seconds:.2f}s on {effective_n_jobs(TRAIN_JOBS)} of {os.cpu_count()} cores")
+    print(f"  R² score: {r2:.4f}")
+    return model, scaler
+
+
+def _atomic_write(path, data: bytes):
+    # write to a temp file then rename, so readers never see a half written file
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def artifact_path(version: str) -> str:
+    return os.path.join(MODEL_DIR, f"demand_model.{version}.npz")
 
-    # Train model
+
+def linear_pair(mean, scale, coef, intercept):
+    # fitted StandardScaler + LinearRegression from their arrays
+    scaler = StandardScaler()
+    scaler.mean_, scaler.scale_ = mean, scale
+    scaler.n_features_in_ = len(mean)
     model = LinearRegression()
-    model.fit(X_scaled, y)
+    model.coef_, model.intercept_ = coef, float(intercept)
+    model.n_features_in_ = len(mean)
+    return scaler, model
 
-    # Save model and scaler
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(model, f)
-    with open(SCALER_PATH, 'wb') as f:
-        pickle.dump(scaler, f)
 
-    print(f"ML model trained on {len(products)} products")
-    print(f"  R² score: {model.score(X_scaled, y):.4f}")
-    return model, scaler
+def model_arrays(model, scaler) -> dict:
+    # row 0 = the global pair, then one row per segment (named in "segments")
+    names = list(model.segments) if isinstance(model, SegmentedModel) else []
+    pairs = [(scaler, model.model if isinstance(model, SegmentedModel) else model)]
+    pairs += [model.segments[name] for name in names]
+    return {
+        "mean": np.array([s.mean_ for s, _ in pairs], dtype=float),
+        "scale": np.array([s.scale_ for s, _ in pairs], dtype=float),
+        "coef": np.array([m.coef_ for _, m in pairs], dtype=float),
+        "intercept": np.array([m.intercept_ for _, m in pairs], dtype=float),
+        "segments": np.array(names, dtype=str),
+    }
+
+
+def model_from_arrays(arrays, segmented: bool):
+    mean, scale, coef, intercept = arrays["mean"], arrays["scale"], arrays["coef"], arrays["intercept"]
+    scaler, model = linear_pair(mean[0], scale[0], coef[0], intercept[0])
+    if not segmented:
+        return model, scaler
+    segments = {
+        str(name): linear_pair(mean[i], scale[i], coef[i], intercept[i])
+        for i, name in enumerate(arrays["segments"], start=1)
+    }
+    return SegmentedModel(scaler, model, segments), scaler
+
+
+def save_model(model, scaler, **metadata) -> str:
+    # one uncompressed .npz per version (written to a temp file and renamed),
+    # then the version pointer - a reader sees the old or the new model,
+    # never a mix. Old versions beyond MODEL_KEEP_VERSIONS are pruned
+    version = str(time.time_ns())
+    meta = {
+        "format": ARTIFACT_FORMAT,
+        "version": version,
+        "created_at": time.time(),
+        "features": FEATURES,
+        "segmented": isinstance(model, SegmentedModel),
+        **metadata,
+    }
+    buffer = io.BytesIO()
+    np.savez(buffer, meta=np.array(json.dumps(meta)), **model_arrays(model, scaler))
+    _atomic_write(artifact_path(version), buffer.getvalue())
+    _atomic_write(VERSION_PATH, version.encode())
+    prune_artifacts()
+    return version
+
+
+def _mmap_member(path: str, name: str):
+    # memory-map one array of an uncompressed .npz (np.load ignores mmap_mode
+    # for archives): find the member's data offset in the zip, then its .npy header
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        with np.load(path, allow_pickle=False) as archive:
+            return archive[name]
+    with open(path, "rb") as f:
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack("<HH", f.read(4))
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        major, _ = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if major == 1 else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+    if not shape or 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape, offset=offset,
+                     order="F" if fortran_order else "C")
+
 
+def read_artifact(path: str, mmap: bool = MODEL_MMAP):
+    # -> (model, scaler, metadata) of one artifact
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json.loads(str(archive["meta"]))
+        if meta.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported model artifact format {meta.get('format')}")
+        arrays = {name: archive[name] for name in ("mean", "scale", "coef", "intercept", "segments")}
+    if mmap:
+        arrays.update({name: _mmap_member(path, name) for name in ("mean", "scale", "coef", "intercept")})
+    model, scaler = model_from_arrays(arrays, meta["segmented"])
+    return model, scaler, meta
 
-def load_model():
-    #Load trained model from disk 
-    if not os.path.exists(MODEL_PATH):
+
+def read_metadata(path: str) -> dict:
+    # metadata of one artifact (+ its number of segment models), arrays not loaded
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json.loads(str(archive["meta"]))
+        meta["segment_count"] = len(archive["segments"])
+    return meta
+
+
+def list_versions() -> list:
+    # saved versions, newest first
+    versions = [os.path.basename(p)[len("demand_model."):-len(".npz")]
+                for p in glob.glob(os.path.join(MODEL_DIR, "demand_model.*.npz"))]
+    return sorted((v for v in versions if v.isdigit()), key=int, reverse=True)
+
+
+def prune_artifacts(keep: int = MODEL_KEEP_VERSIONS):
+    # the newest `keep` per source, so online updates never push the trained
+    # versions (the rollback targets) out
+    active = read_model_version()
+    kept = {}  # source -> versions kept so far
+    for version in list_versions():
+        try:
+            source = read_metadata(artifact_path(version)).get("source")
+        except FileNotFoundError:
+            continue
+        kept[source] = kept.get(source, 0) + 1
+        if kept[source] > keep and version != active:
+            try:
+                os.remove(artifact_path(version))
+            except FileNotFoundError:
+                pass  # pruned by another process
+            except OSError:
+                pass  # still mapped by a worker (Windows), next prune gets it
+
+
+def activate_version(version: str):
+    # point VERSION_PATH at an already saved artifact (rollback) -
+    # every process picks it up like a retrain
+    if not os.path.exists(artifact_path(version)):
+        raise FileNotFoundError(f"No saved model version {version}")
+    _atomic_write(VERSION_PATH, version.encode())
+
+
+def read_model_version():
+    try:
+        with open(VERSION_PATH) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def trained_since(timestamp: float):
+    # newest version of a training that read its data at/after `timestamp`
+    # (so it already saw every change made before the job was requested),
+    # else None. A training that only finished after it doesn't count
+    for version in list_versions():
+        try:
+            meta = read_metadata(artifact_path(version))
+        except FileNotFoundError:
+            continue
+        if meta["created_at"] < timestamp:
+            return None  # newest first, the rest are older
+        if meta.get("source") == "training" and meta.get("data_at", 0) >= timestamp:
+            return version
+    return None
+
+
+def load_model(version=None):
+    # Load a trained model from disk (the active version by default)
+    version = version or read_model_version()
+    if version is None:
+        return None, None
+    try:
+        model, scaler, _ = read_artifact(artifact_path(version))
+    except FileNotFoundError:
         return None, None
-    with open(MODEL_PATH, 'rb') as f: #= basically saving the model in disk using pickle library
-        model = pickle.load(f)
-    with open(SCALER_PATH, 'rb') as f:
-        scaler = pickle.load(f)
     return model, scaler
 
 
+class ModelLock:
+    # Cross-process lock on LOCK_PATH (fcntl.lockf, a POSIX record lock, so a
+    # forked training worker doesn't inherit it), reentrant within the process
+    # - a rollback holds it while ensure_fresh takes it again
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reset()
+
+    def _reset(self):
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                self._file = open(self.path, "a+b")
+                if fcntl is not None:
+                    fcntl.lockf(self._file, fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            self._file.close()  # releases the lock
+            self._file = None
+        self._thread_lock.release()
+
+
+model_lock = ModelLock(LOCK_PATH)
+if hasattr(os, "register_at_fork"):
+    # a child forked while another thread held the lock starts with it released
+    os.register_at_fork(after_in_child=model_lock._reset)
+
+
+class ModelRegistry:
+    # Process wide holder of the active model.
+    # - model + scaler are kept as ONE tuple (version, model, scaler) so a reader
+    #   can never get a new model with an old scaler
+    # - load() runs once at startup, after that get() only stats VERSION_PATH
+    #   (at most every MODEL_CHECK_INTERVAL seconds) to pick up a retrain done
+    #   by another process
+    # - it never trains, if nothing is loaded get() returns (None, None) and
+    #   the routes fall back to the stored demand_forecast
+
+    def __init__(self, check_interval: float = MODEL_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._active = (None, None, None)
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+
+    @property
+    def version(self):
+        return self._active[0]
+
+    def publish(self, model, scaler, version):
+        self._active = (version, model, scaler)
+        self._last_check = time.monotonic()
+
+    def load(self) -> bool:
+        # (re)load whatever is on disk, returns True if a model is active
+        with self._lock:
+            self._last_check = time.monotonic()
+            version = read_model_version()
+            if version is not None and version == self.version:
+                return True
+            model, scaler = load_model(version)
+            if model is not None:
+                self._active = (version, model, scaler)
+            return self._active[1] is not None
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        version = read_model_version()
+        if version is not None and version != self.version:
+            self.load()
+
+    def get(self):
+        self._maybe_reload()
+        _, model, scaler = self._active
+        return model, scaler
+
+
+registry = ModelRegistry()
+
+
 def predict_demand(product, model, scaler):
     # Now we Predict demand for a single product - 
     if model is None or scaler is None:
@@ -83,8 +460,23 @@ def predict_demand(product, model, scaler):
         float(product.customer_rating) if product.customer_rating else 3.0,
     ]])
 
-    features_scaled = scaler.transform(features)
-    prediction = model.predict(features_scaled)[0]
+    prediction = predict_matrix(features, model, scaler, [getattr(product, "category", None)])[0]
 
     # here we make sure prediction is +ve 
-    return max(0, round(prediction, 2))
\ No newline at end of file
+    return max(0, round(prediction, 2))
+
+
+def predict_demand_batch(products, model, scaler):
+    # Same as predict_demand but for a whole list of products at once -
+    # one feature matrix and one predict call (per segment)
+    # instead of N trips through sklearn input validation
+    if model is None or scaler is None:
+        return None
+    if len(products) == 0:
+        return np.empty(0)
+
+    X = prepare_features(products)
+    predictions = predict_matrix(X, model, scaler, [getattr(p, "category", None) for p in products])
+
+    # round + clip to >= 0 exactly like predict_demand does per product
+    return np.clip(np.round(predictions, 2), 0, None)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Numeric, Boolean, TIMESTAMP, ForeignKey, Enum, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Numeric, Float, Boolean, Date, TIMESTAMP, ForeignKey, Enum, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -48,6 +48,7 @@ class User(Base):
     hashed_password = Column(Text, nullable=False)
     role            = Column(Enum(UserRole), default=UserRole.buyer, nullable=False, index=True)
     is_verified     = Column(Boolean, default=False)
+    token_version   = Column(Integer, default=0, nullable=False, server_default="0")  # bump to revoke issued tokens
     created_at      = Column(TIMESTAMP, server_default=func.now())
 
     products = relationship("Product", back_populates="creator")
@@ -71,4 +72,125 @@ class Product(Base):
     created_at      = Column(TIMESTAMP, server_default=func.now())
     updated_at      = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
-    creator = relationship("User", back_populates="products")
\ No newline at end of file
+    creator = relationship("User", back_populates="products")
+
+
+# Pricing snapshot
+    # What /forecast and /optimized return, materialized per product so the
+    # read endpoints don't re-run inference + pricing over the whole catalog.
+    # Maintained by pricing_snapshot.py (incrementally on product writes,
+    # fully after a model retrain).
+class PricingSnapshot(Base):
+    __tablename__ = "pricing_snapshot"
+
+    product_id      = Column(Integer, ForeignKey("products.product_id", ondelete="CASCADE"), primary_key=True)
+    demand_forecast = Column(Numeric(12, 2))
+    optimized_price = Column(Numeric(10, 2))
+    model_version   = Column(String(40))
+    updated_at      = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+class CatalogStats(Base):
+    # single row (id = 1) of catalog wide aggregates
+    __tablename__ = "catalog_stats"
+
+    id              = Column(Integer, primary_key=True)
+    forecast_sum    = Column(Float, nullable=False, default=0)  # sum of snapshot demand_forecast
+    forecast_count  = Column(Integer, nullable=False, default=0)
+    priced_avg      = Column(Float)  # avg forecast the current snapshot prices were computed with
+    demand_sum      = Column(Float, nullable=False, default=0)  # sum of compute_demand_forecast over all products
+    demand_count    = Column(Integer, nullable=False, default=0)
+    model_version   = Column(String(40))  # model the snapshot was last fully rebuilt with
+    catalog_version = Column(Integer, nullable=False, default=0)  # bumped on every product write
+    updated_at      = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+class ModelStatistics(Base):
+    # sufficient statistics of the demand model's least squares fit, one row
+    # per category + one for the whole catalog (see online_model.py)
+    __tablename__ = "model_statistics"
+
+    segment         = Column(String(120), primary_key=True)
+    count           = Column(Integer, nullable=False, default=0)
+    xtx             = Column(Text, nullable=False)  # JSON, [1, features] x [1, features]
+    xty             = Column(Text, nullable=False)  # JSON
+    snapshot_theta  = Column(Text)  # JSON, coefficients the pricing snapshot forecasts were computed with
+    updated_at      = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+# Sales history
+    # Append-only point of sale events (BRIN index on sold_at on PostgreSQL,
+    # see migrations/versions) + a per product / day rollup maintained at ingestion,
+    # which is what aggregates and forecasting read. See sales.py.
+class SalesEvent(Base):
+    __tablename__ = "sales_events"
+
+    id              = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    product_id      = Column(Integer, ForeignKey("products.product_id", ondelete="CASCADE"), nullable=False)
+    quantity        = Column(Integer, nullable=False)
+    unit_price      = Column(Numeric(10, 2), nullable=False)
+    sold_at         = Column(TIMESTAMP, nullable=False)
+    received_at     = Column(TIMESTAMP, server_default=func.now())
+
+
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+    __table_args__ = (Index("ix_sales_daily_day", "day"),)
+
+    product_id      = Column(Integer, ForeignKey("products.product_id", ondelete="CASCADE"), primary_key=True)
+    day             = Column(Date, primary_key=True)
+    units           = Column(Integer, nullable=False, default=0)
+    revenue         = Column(Numeric(14, 2), nullable=False, default=0)
+    events          = Column(Integer, nullable=False, default=0)
+
+
+class SalesForecast(Base):
+    # demand over the next horizon_days from the sales history (sales_forecast.py),
+    # used instead of the stock/sales ratio formula for products that have one
+    __tablename__ = "sales_forecasts"
+
+    product_id      = Column(Integer, ForeignKey("products.product_id", ondelete="CASCADE"), primary_key=True)
+    forecast        = Column(Numeric(12, 2), nullable=False)  # units over horizon_days
+    demand          = Column(Numeric(12, 2))  # forecast on the formula's scale, what pricing uses
+    horizon_days    = Column(Integer, nullable=False)
+    history_days    = Column(Integer, nullable=False)
+    updated_at      = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+# Email outbox
+    # Emails are written here in the same transaction as the change that
+    # triggers them (e.g. register) and sent by the background sender in
+    # email_service.py, with retries and a dead-letter state.
+class EmailStatus(str, enum.Enum):
+    pending = "pending"
+    sent    = "sent"
+    dead    = "dead"  # gave up after EMAIL_MAX_ATTEMPTS
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (Index("ix_email_outbox_status_next", "status", "next_attempt_at"),)
+
+    id              = Column(Integer, primary_key=True)
+    to_email        = Column(String(150), nullable=False)
+    subject         = Column(String(255), nullable=False)
+    html_content    = Column(Text, nullable=False)
+    status          = Column(Enum(EmailStatus), default=EmailStatus.pending, nullable=False)
+    attempts        = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    last_error      = Column(Text)
+    created_at      = Column(TIMESTAMP, server_default=func.now())
+    sent_at         = Column(TIMESTAMP)
+
+
+# Background training jobs (training_jobs.py)
+    # One row per job, so a status poll answers the same on every server worker
+class TrainingJob(Base):
+    __tablename__ = "training_jobs"
+
+    job_id          = Column(String(32), primary_key=True)
+    status          = Column(String(20), nullable=False)  # running / succeeded / failed
+    created_at      = Column(TIMESTAMP, nullable=False, index=True)
+    finished_at     = Column(TIMESTAMP)
+    model_version   = Column(String(40))
+    error           = Column(Text)
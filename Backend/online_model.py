@@ -0,0 +1,237 @@
+# Incremental (online) demand model updates - MODEL_ONLINE_UPDATES=true.
+#
+# The demand model is an ordinary least squares fit, which only needs the
+# sufficient statistics A = X'X and b = X'y of the features with a leading 1
+# (the intercept). They are kept per category plus one row for the whole
+# catalog in model_statistics, so a product create / update / delete is
+# absorbed by taking its old row out and adding the new one - O(features²),
+# no table read - and the coefficients are re-solved exactly (a 6x6 system
+# per segment).
+#
+# This runs after the product write committed, in a short transaction of its
+# own, so a rolled back write never reaches the model and the statistics rows
+# are only locked for a few ms. The served model (and the pricing snapshot)
+# keep the coefficients they were built with until the fresh ones would move
+# the catalog's forecasts by more than MODEL_REFRESH_DRIFT (RMS change
+# relative to the mean demand), which the same statistics give exactly without
+# touching the products. Only then is the re-solved model published like a
+# trained one (artifact + registry, so the other workers pick it up) and the
+# snapshot rebuilt - by a background job in the training worker process
+# (training_jobs.submit_online_refresh), never on the request path.
+#
+# A full retrain and a bulk import reset the statistics from the table.
+
+import json
+import os
+import numpy as np
+from sqlalchemy.orm import Session
+
+from sqlalchemy.exc import IntegrityError
+
+import models
+import ml_model
+import pricing_snapshot
+from ml_model import SegmentedModel, linear_pair, prepare_features, registry, save_model, segment_rows
+
+MODEL_ONLINE_UPDATES = os.getenv("MODEL_ONLINE_UPDATES", "false").lower() in ("1", "true", "yes")
+MODEL_REFRESH_DRIFT = float(os.getenv("MODEL_REFRESH_DRIFT", 0.02))  # 2 % RMS change of the forecasts
+
+ALL = "*all*"  # segment key of the whole catalog
+
+
+def sample(product):
+    # (features with a leading 1, target, category) of one product, like train_model sees it
+    x = np.concatenate(([1.0], prepare_features([product])[0]))
+    y = float(product.demand_forecast) if product.demand_forecast else float(product.units_sold or 0)
+    return x, y, product.category
+
+
+def compute_statistics(X: np.ndarray, y: np.ndarray, categories) -> dict:
+    # segment -> (count, A, b)
+    Xa = np.column_stack([np.ones(len(X)), X])
+    stats = {ALL: (len(X), Xa.T @ Xa, Xa.T @ y)}
+    for name, rows in segment_rows(categories).items():
+        stats[name] = (len(rows), Xa[rows].T @ Xa[rows], Xa[rows].T @ y[rows])
+    return stats
+
+
+def _solve(A: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # least squares coefficients from the normal equations (min norm if singular)
+    return np.linalg.lstsq(A, b, rcond=None)[0]
+
+
+def _has_own_model(seg: str, count: int) -> bool:
+    # same rule as ml_model.fit_segmented
+    return seg != ALL and ml_model.MODEL_SEGMENTS == "category" and count >= ml_model.MIN_SEGMENT_SIZE
+
+
+def effective_coefficients(stats: dict) -> dict:
+    # coefficients each segment's products are predicted with (the catalog
+    # wide ones for small segments)
+    theta_all = _solve(stats[ALL][1], stats[ALL][2])
+    return {
+        seg: _solve(A, b) if _has_own_model(seg, count) else theta_all
+        for seg, (count, A, b) in stats.items()
+    }
+
+
+def _pair(count: int, A: np.ndarray, theta: np.ndarray):
+    # the same coefficients as a fitted StandardScaler + LinearRegression, so
+    # the result is served (and saved) like a batch trained model
+    mean = A[0, 1:] / count
+    var = np.maximum(np.diag(A)[1:] / count - mean ** 2, 0)
+    scale = np.sqrt(var)
+    scale[scale < 10 * np.finfo(float).eps] = 1.0  # constant feature, like StandardScaler
+    return linear_pair(mean, scale, theta[1:] * scale, theta[0] + theta[1:] @ mean)
+
+
+def build_model(stats: dict, thetas: dict) -> SegmentedModel:
+    scaler, model = _pair(stats[ALL][0], stats[ALL][1], thetas[ALL])
+    segments = {
+        seg: _pair(count, A, thetas[seg])
+        for seg, (count, A, b) in stats.items()
+        if _has_own_model(seg, count)
+    }
+    return SegmentedModel(scaler, model, segments)
+
+
+def drift(stats: dict, thetas: dict, snapshot_thetas: dict) -> float:
+    # exact RMS change of the catalog forecasts between the snapshot's
+    # coefficients and the current ones, relative to the mean demand:
+    # sum over segments of d'A d (products without a category are what's
+    # left of the catalog wide A)
+    count, A_all, b_all = stats[ALL]
+    if count == 0 or b_all[0] == 0:
+        return 0.0
+    rest = A_all.copy()
+    total = 0.0
+    for seg, (_, A, _) in stats.items():
+        if seg == ALL:
+            continue
+        rest -= A
+        d = thetas[seg] - snapshot_thetas.get(seg, snapshot_thetas[ALL])
+        total += d @ A @ d
+    d = thetas[ALL] - snapshot_thetas[ALL]
+    total += d @ rest @ d
+    return float(np.sqrt(max(total, 0.0) / count) / abs(b_all[0] / count))
+
+
+def _decode(row: models.ModelStatistics):
+    return row.count, np.array(json.loads(row.xtx)), np.array(json.loads(row.xty))
+
+
+def _encode(row: models.ModelStatistics, count: int, A: np.ndarray, b: np.ndarray):
+    row.count, row.xtx, row.xty = count, json.dumps(A.tolist()), json.dumps(b.tolist())
+
+
+def absorb(db: Session, old=None, new=None):
+    # Apply one committed product write (old / new are sample() tuples taken
+    # before the commit, None for a create / delete) - commits. No-op until a
+    # full training has initialized the statistics. A crash between the two
+    # commits leaves the statistics one write behind until the next reset
+    if not MODEL_ONLINE_UPDATES:
+        return
+    for attempt in range(2):
+        try:
+            drifted = _apply(db, old, new)
+            break
+        except IntegrityError:
+            # another write created the same new category's row first
+            db.rollback()
+            if attempt:
+                raise
+    if drifted:
+        import training_jobs  # imports this module
+        training_jobs.submit_online_refresh()
+
+
+def _apply(db: Session, old, new) -> bool:
+    # -> True if the coefficients drifted past MODEL_REFRESH_DRIFT
+    touched = sorted({ALL} | {item[2] for item in (old, new) if item is not None and item[2]})
+    # lock only the rows this write changes, in a fixed order (the catalog
+    # row sorts first, so it also orders the rare drift update below)
+    db.query(models.ModelStatistics).filter(models.ModelStatistics.segment.in_(touched)) \
+        .order_by(models.ModelStatistics.segment).with_for_update().all()
+    rows = {r.segment: r for r in db.query(models.ModelStatistics).all()}
+    if ALL not in rows:
+        db.rollback()
+        return False
+    stats = {seg: _decode(row) for seg, row in rows.items()}
+
+    changed = set()
+    for sign, item in ((-1, old), (1, new)):
+        if item is None:
+            continue
+        x, y, category = item
+        for seg in (ALL, category) if category else (ALL,):
+            count, A, b = stats.get(seg) or (0, np.zeros((len(x), len(x))), np.zeros(len(x)))
+            stats[seg] = (count + sign, A + sign * np.outer(x, x), b + sign * y * x)
+            changed.add(seg)
+    if not changed or stats[ALL][0] == 0:
+        db.rollback()
+        return False
+
+    for seg in changed:
+        if seg not in rows:
+            rows[seg] = models.ModelStatistics(segment=seg)
+            db.add(rows[seg])
+        _encode(rows[seg], *stats[seg])
+
+    thetas = effective_coefficients(stats)
+    snapshot_thetas = {seg: np.array(json.loads(r.snapshot_theta)) for seg, r in rows.items() if r.snapshot_theta}
+    drifted = ALL not in snapshot_thetas or drift(stats, thetas, snapshot_thetas) > MODEL_REFRESH_DRIFT
+    if drifted:
+        # claim the refresh, so the next writes measure their drift from here
+        # instead of all queueing one
+        for seg, row in rows.items():
+            row.snapshot_theta = json.dumps(thetas[seg].tolist())
+    db.commit()
+    return drifted
+
+
+def publish(db: Session):
+    # runs in the training worker process (training_jobs.submit_online_refresh):
+    # re-solve from the statistics as they are now, publish the model to every
+    # worker and re-forecast the catalog with it, under the model lock like a
+    # training -> version, or None if a training reset the statistics away
+    with ml_model.model_lock:
+        rows = {r.segment: r for r in db.query(models.ModelStatistics).all()}
+        if ALL not in rows:
+            db.rollback()
+            return None
+        stats = {seg: _decode(row) for seg, row in rows.items()}
+        if stats[ALL][0] == 0:
+            db.rollback()
+            return None
+        thetas = effective_coefficients(stats)
+        for seg, row in rows.items():
+            row.snapshot_theta = json.dumps(thetas[seg].tolist())
+        db.commit()
+        model = build_model(stats, thetas)
+        version = save_model(model, model.scaler, source="online", samples=stats[ALL][0])
+        registry.publish(model, model.scaler, version)
+        pricing_snapshot.rebuild(db, model, model.scaler, version)
+        return version
+
+
+def reset(db: Session):
+    # recompute the statistics from the products table (after a full training
+    # or a bulk import, which also rebuild the snapshot) - commits
+    if not MODEL_ONLINE_UPDATES:
+        return
+    products = db.query(
+        models.Product.cost_price, models.Product.selling_price, models.Product.stock_available,
+        models.Product.units_sold, models.Product.customer_rating, models.Product.demand_forecast,
+        models.Product.category,
+    ).all()
+    db.query(models.ModelStatistics).delete()
+    if products:
+        X = prepare_features(products)
+        y = np.array([float(p.demand_forecast) if p.demand_forecast else float(p.units_sold) for p in products])
+        stats = compute_statistics(X, y, [p.category for p in products])
+        thetas = effective_coefficients(stats)
+        for seg, (count, A, b) in stats.items():
+            row = models.ModelStatistics(segment=seg, snapshot_theta=json.dumps(thetas[seg].tolist()))
+            _encode(row, count, A, b)
+            db.add(row)
+    db.commit()
@@ -0,0 +1,141 @@
+# Profit / revenue maximizing prices from the demand model (mode=elasticity
+# on /api/products/optimized).
+#
+# The formula price in pricing.py just interpolates between cost and selling
+# price. Here the demand model is asked how demand reacts to the price:
+# - demand curve per product: D(p) = d0 + slope * (p - p0), with d0 the
+#   predicted demand at the current price p0 and slope dD/dp from a central
+#   difference of the model (two extra batched predictions for the catalog).
+#   Optionally pooled per category (median slope), which is steadier for
+#   segments with few products.
+# - profit (p - cost) * D(p) is concave when slope < 0, so the optimum is
+#   p* = (cost + p0 - d0 / slope) / 2, clipped to the bounds:
+#   min margin over cost and max change from the current price.
+#   revenue is the same with cost = 0. If demand doesn't drop with the price
+#   (slope >= 0) the upper bound wins.
+# Closed form over NumPy arrays, so the whole catalog solves in one pass.
+
+import os
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import metrics
+import models
+from ml_model import registry, prepare_features, predict_matrix
+from pricing import round2
+
+OPTIMIZER_MIN_MARGIN = float(os.getenv("OPTIMIZER_MIN_MARGIN", 0.05))  # price >= cost * 1.05
+OPTIMIZER_MAX_CHANGE = float(os.getenv("OPTIMIZER_MAX_CHANGE", 0.20))  # within +-20 % of the current price
+PRICE_STEP = 0.01  # relative step for the slope (the demand model is linear, any step gives the same slope)
+
+SELLING_PRICE_FEATURE = 1  # column of selling_price in prepare_features
+CENT = Decimal("0.01")  # Numeric(10, 2) prices, like the snapshot's optimized_price
+
+OBJECTIVES = ("profit", "revenue")
+ELASTICITY_LEVELS = ("product", "category")
+
+
+def demand_curves(X: np.ndarray, model, scaler, categories=None, step: float = PRICE_STEP):
+    # -> (demand at the current price, dD/dp) per row of the feature matrix
+    # (categories route rows to their segment model, see ml_model.SegmentedModel)
+    price = X[:, SELLING_PRICE_FEATURE]
+    delta = np.where(price > 0, price * step, step)
+    up, down = X.copy(), X.copy()
+    up[:, SELLING_PRICE_FEATURE] += delta
+    down[:, SELLING_PRICE_FEATURE] -= delta
+    d0 = np.clip(predict_matrix(X, model, scaler, categories), 0, None)
+    slope = (predict_matrix(up, model, scaler, categories)
+             - predict_matrix(down, model, scaler, categories)) / (2 * delta)
+    return d0, slope
+
+
+def pool_by_category(slope: np.ndarray, categories) -> np.ndarray:
+    # median slope of each category (products without one form their own group)
+    keys = np.array([c or "" for c in categories], dtype=object)
+    pooled = np.empty_like(slope)
+    for key in np.unique(keys):
+        members = keys == key
+        pooled[members] = np.median(slope[members])
+    return pooled
+
+
+def elasticity(d0: np.ndarray, slope: np.ndarray, price: np.ndarray) -> np.ndarray:
+    # point price elasticity of demand, NaN where there is no demand
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(d0 > 0, slope * price / d0, np.nan)
+
+
+def solve(cost, price, d0, slope, objective: str = "profit",
+          min_margin: float = OPTIMIZER_MIN_MARGIN, max_change: float = OPTIMIZER_MAX_CHANGE):
+    # -> (optimal price, demand at that price) for every product
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective must be one of {OBJECTIVES}")
+    cost = np.asarray(cost, dtype=float)
+    price = np.asarray(price, dtype=float)
+
+    lower = np.maximum(cost * (1 + min_margin), price * (1 - max_change))
+    upper = np.maximum(price * (1 + max_change), lower)  # min margin wins over max change
+
+    unit_cost = cost if objective == "profit" else np.zeros_like(cost)
+    intercept = d0 - slope * price  # D(p) = intercept + slope * p
+    with np.errstate(divide="ignore", invalid="ignore"):
+        best = np.where(slope < 0, unit_cost / 2 - intercept / (2 * slope), upper)
+    # no predicted demand: nothing to optimize, keep the current price (within bounds)
+    best = np.where(d0 > 0, best, price)
+    best = np.clip(best, lower, upper)
+    return best, np.clip(intercept + slope * best, 0, None)
+
+
+@metrics.timed("solve_catalog")
+def solve_catalog(db: Session, objective: str = "profit", level: str = "product",
+                  min_margin: float = OPTIMIZER_MIN_MARGIN, max_change: float = OPTIMIZER_MAX_CHANGE):
+    if level not in ELASTICITY_LEVELS:
+        raise ValueError(f"level must be one of {ELASTICITY_LEVELS}")
+    with metrics.stage("solve_catalog", "model"):
+        model, scaler = registry.get()
+    if model is None:
+        raise RuntimeError("No trained demand model yet")
+
+    with metrics.stage("solve_catalog", "db"):
+        rows = db.query(
+            models.Product.product_id, models.Product.name, models.Product.description,
+            models.Product.category, models.Product.cost_price, models.Product.selling_price,
+            models.Product.stock_available, models.Product.units_sold, models.Product.customer_rating,
+        ).order_by(models.Product.product_id).all()
+    if not rows:
+        return []
+
+    with metrics.stage("solve_catalog", "inference"):
+        X = prepare_features(rows)
+        categories = [r.category for r in rows]
+        d0, slope = demand_curves(X, model, scaler, categories)
+        if level == "category":
+            slope = pool_by_category(slope, categories)
+
+    with metrics.stage("solve_catalog", "solve"):
+        cost, price = X[:, 0], X[:, SELLING_PRICE_FEATURE]
+        best, demand = solve(cost, price, d0, slope, objective, min_margin, max_change)
+        best = round2(best)
+        unit_cost = cost if objective == "profit" else 0
+        expected = round2((best - unit_cost) * demand)
+        elasticities = np.round(elasticity(d0, slope, price), 4)
+
+    return [
+        {
+            "product_id": r.product_id,
+            "name": r.name,
+            "description": r.description,
+            "category": r.category,
+            "cost_price": r.cost_price,
+            "selling_price": r.selling_price,
+            "optimized_price": Decimal(str(p)).quantize(CENT),  # "24.00" like the other modes
+            "demand_forecast": f,
+            "expected_demand": d,
+            "elasticity": None if e != e else e,  # NaN -> null
+            "expected_objective": v,
+        }
+        for r, p, f, d, e, v in zip(rows, best.tolist(), round2(d0).tolist(), round2(demand).tolist(),
+                                    elasticities.tolist(), expected.tolist())
+    ]
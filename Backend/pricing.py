@@ -0,0 +1,174 @@
+# Demand Forecast & Optimized Price Formula
+# (shared by the product routes and the pricing snapshot)
+
+import numpy as np
+from sqlalchemy import Float, Numeric, cast, func, type_coerce
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+
+
+def compute_demand_forecast(units_sold: int, stock_available: int) -> float:
+    
+    # Demand Forecast Formula:
+    # seasonal_factor = min(1.5, max(0.8, stock_available / units_sold))
+    # demand_forecast = units_sold * seasonal_factor
+
+    # Logic:
+    # - High stock relative to sales → strong demand trajectory → factor trends up
+    # - Low stock relative to sales  → weak demand             → factor trends down
+    # - Clamped between 0.8 and 1.5 to prevent extreme values
+    units = units_sold or 1
+    stock = stock_available or 1
+    seasonal_factor = min(1.5, max(0.8, stock / units))
+    return round(units * seasonal_factor, 2)
+
+
+def compute_optimized_price(cost_price: float, selling_price: float,
+                             demand_forecast: float, avg_demand: float) -> float:
+    
+    # Optimized Price Formula:
+    # demand_factor = min(1.5, max(0.8, demand_forecast / avg_demand))
+    # optimized_price = cost_price + (selling_price - cost_price) * demand_factor
+
+    # Logic:
+    # - demand_factor > 1 → above avg demand → push price UP toward/above selling price
+    # - demand_factor < 1 → below avg demand → pull price DOWN toward cost price
+    # - Clamped between 0.8 and 1.5 to stay within a safe margin
+    
+    avg = avg_demand or 1
+    demand_factor = min(1.5, max(0.8, demand_forecast / avg))
+    optimized = cost_price + (selling_price - cost_price) * demand_factor
+    return round(optimized, 2)
+
+
+def optimized_price(cost_price: float, selling_price: float, forecast, avg_forecast: float) -> float:
+    # formula used by /optimized (ML forecast vs catalog avg forecast):
+    # demand_factor = min(1.5, max(0.8, forecast / avg_forecast))
+    # optimized_price = cost_price + (selling_price - cost_price) * demand_factor
+    demand_factor = min(1.5, max(0.8, float(forecast or 0) / avg_forecast if avg_forecast > 0 else 1))
+    return round(cost_price + (selling_price - cost_price) * demand_factor, 2)
+
+
+# Pricing engine: array versions of the formulas above for everything that
+# prices more than one product (snapshot rebuild / refresh, bulk import, seed).
+# Inputs are columns (lists, NumPy arrays or pandas Series, e.g. straight from
+# pd.read_sql). Same float operations in the same order, so results match the
+# scalar functions exactly.
+
+def _column(values) -> np.ndarray:
+    # Decimal / int / None -> float64, None becomes NaN
+    return np.asarray(values, dtype=float)
+
+
+def _or_one(values: np.ndarray) -> np.ndarray:
+    # `x or 1` for a column (0 and None/NaN -> 1)
+    return np.where((values == 0) | np.isnan(values), 1.0, values)
+
+
+def round2(values) -> np.ndarray:
+    # np.round(x, 2) scales by 100 first, which can land on the other side of
+    # a .5 tie than Python's round() (exact decimal value). Redo the handful
+    # of near-ties with round() so both agree bit for bit.
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    tol = 1e-9 * np.maximum(1.0, np.abs(scaled))
+    near_tie = np.nonzero(np.abs(scaled - np.floor(scaled) - 0.5) < tol)[0]
+    if near_tie.size:
+        rounded[near_tie] = [round(float(v), 2) for v in values[near_tie]]
+    return rounded
+
+
+def seasonal_factor_array(units_sold, stock_available) -> np.ndarray:
+    return np.clip(_or_one(_column(stock_available)) / _or_one(_column(units_sold)), 0.8, 1.5)
+
+
+def demand_factor_array(demand_forecast, avg_demand: float) -> np.ndarray:
+    return np.clip(_column(demand_forecast) / avg_demand, 0.8, 1.5)
+
+
+def compute_demand_forecast_array(units_sold, stock_available) -> np.ndarray:
+    units = _or_one(_column(units_sold))
+    return round2(units * seasonal_factor_array(units_sold, stock_available))
+
+
+def compute_optimized_price_array(cost_price, selling_price, demand_forecast, avg_demand: float) -> np.ndarray:
+    cost = _column(cost_price)
+    selling = _column(selling_price)
+    demand_factor = demand_factor_array(demand_forecast, avg_demand or 1)
+    return round2(cost + (selling - cost) * demand_factor)
+
+
+def optimized_price_array(cost_price, selling_price, forecast, avg_forecast: float) -> np.ndarray:
+    # array version of optimized_price (missing forecasts count as 0)
+    cost = _column(cost_price)
+    selling = _column(selling_price)
+    if avg_forecast > 0:
+        demand_factor = demand_factor_array(np.nan_to_num(_column(forecast), nan=0.0), avg_forecast)
+    else:
+        demand_factor = np.ones_like(cost)
+    return round2(cost + (selling - cost) * demand_factor)
+
+
+def price_frame(df, avg_demand: float = None):
+    # demand_forecast / optimized_price for a frame with units_sold,
+    # stock_available, cost_price and selling_price columns (seed, scripts).
+    # avg_demand defaults to the frame's own average forecast
+    forecasts = compute_demand_forecast_array(df["units_sold"], df["stock_available"])
+    if avg_demand is None:
+        avg_demand = float(forecasts.mean()) if len(forecasts) else 1
+    prices = compute_optimized_price_array(df["cost_price"], df["selling_price"], forecasts, avg_demand)
+    return forecasts, prices
+
+
+# SQL versions of the formulas: column expressions the database evaluates
+# (GET /forecast and /optimized with mode=sql). Portable between PostgreSQL
+# and SQLite: LEAST / GREATEST are compiled to SQLite's multi-argument
+# min() / max(). The database rounds exact half cents up, Python's round()
+# goes by the float's binary value, so prices landing on a half cent (~0.2%
+# of a random catalog) can be a cent apart between the two.
+
+class least(GenericFunction):
+    type = Float()
+    inherit_cache = True
+
+
+class greatest(GenericFunction):
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(least, "sqlite")
+def _least_sqlite(element, compiler, **kw):
+    return f"min({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(greatest, "sqlite")
+def _greatest_sqlite(element, compiler, **kw):
+    return f"max({compiler.process(element.clauses, **kw)})"
+
+
+def _or_one_sql(column):
+    # `x or 1`
+    return func.coalesce(func.nullif(column, 0), 1)
+
+
+def _clamp_sql(value):
+    return least(1.5, greatest(0.8, value))
+
+
+def round2_sql(value, precision: int = 10):
+    # PostgreSQL has no round(double precision, int), so round as numeric
+    return type_coerce(func.round(cast(value, Numeric), 2), Numeric(precision, 2))
+
+
+def demand_forecast_sql(units_sold, stock_available):
+    units = _or_one_sql(units_sold)
+    seasonal_factor = _clamp_sql(cast(_or_one_sql(stock_available), Float) / units)
+    return round2_sql(units * seasonal_factor, 12)
+
+
+def optimized_price_sql(cost_price, selling_price, demand_forecast, avg_demand):
+    # avg_demand is usually a window: func.avg(demand).over()
+    demand_factor = _clamp_sql(cast(demand_forecast, Float) / _or_one_sql(avg_demand))
+    return round2_sql(cost_price + (selling_price - cost_price) * demand_factor)
@@ -0,0 +1,245 @@
+# Materialized forecast / optimized price per product.
+#
+# /forecast and /optimized used to re-run ML inference over the whole catalog
+# on every GET just to get the catalog average forecast, then re-price every
+# product. Instead we keep:
+# - pricing_snapshot: demand_forecast + optimized_price per product
+# - catalog_stats (1 row): running sum/count of the snapshot forecasts and the
+#   average the current prices were computed with (priced_avg)
+#
+# Product create/update/delete adjust the sum/count incrementally and only
+# re-price that product. All prices are refreshed only when the running
+# average drifts more than PRICE_REFRESH_DRIFT away from priced_avg.
+# A retrain rebuilds the whole snapshot (in the training worker).
+#
+# catalog_stats also keeps the sum/count of the formula based
+# compute_demand_forecast over all products, so update_product gets the
+# catalog avg_demand in O(1) instead of scanning every product.
+
+import os
+import numpy as np
+from sqlalchemy import func, insert, update, delete
+from sqlalchemy.orm import Session
+import metrics
+import models
+from ml_model import model_lock, registry, predict_demand_batch
+from pricing import compute_demand_forecast_array, optimized_price, optimized_price_array
+
+PRICE_REFRESH_DRIFT = float(os.getenv("PRICE_REFRESH_DRIFT", 0.02))  # 2 %
+
+STATS_ID = 1
+CHUNK_SIZE = 10_000
+
+# columns needed for inference + pricing
+_PRICING_COLUMNS = (
+    models.Product.product_id,
+    models.Product.cost_price,
+    models.Product.selling_price,
+    models.Product.stock_available,
+    models.Product.units_sold,
+    models.Product.customer_rating,
+    models.Product.demand_forecast,
+    models.Product.category,  # routes to the segment model
+)
+
+
+def _forecasts(products, model, scaler, sales=None) -> np.ndarray:
+    # Sales history demand (sales_forecast.py, on the formula's scale) where
+    # there is one (NaN in `sales` where not), else the ML forecast, falling back to the stored
+    # demand_forecast when there is no model (or the model predicts 0).
+    # Missing forecasts are NaN
+    stored = np.array([p.demand_forecast for p in products], dtype=float)
+    ml_forecasts = predict_demand_batch(products, model, scaler)
+    forecasts = stored if ml_forecasts is None else np.where(ml_forecasts != 0, ml_forecasts, stored)
+    if sales is None:
+        return forecasts
+    sales = np.asarray(sales, dtype=float)
+    return np.where(np.isnan(sales), forecasts, sales)
+
+
+def get_stats(db: Session) -> models.CatalogStats:
+    stats = db.get(models.CatalogStats, STATS_ID)
+    if stats is None:
+        stats = models.CatalogStats(id=STATS_ID, forecast_sum=0, forecast_count=0,
+                                    demand_sum=0, demand_count=0, catalog_version=0)
+        db.add(stats)
+        db.flush()
+    return stats
+
+
+@metrics.timed("pricing_snapshot", "rebuild")
+def rebuild(db: Session, model, scaler, model_version):
+    # Full recompute of the snapshot - O(N), only after a retrain / at startup
+    rows = _rebuild(db, model, scaler, model_version)
+    db.commit()
+    print(f"Pricing snapshot rebuilt for {rows} products (model {model_version})")
+
+
+def _rebuild(db: Session, model, scaler, model_version) -> int:
+    products = (
+        db.query(*_PRICING_COLUMNS, models.SalesForecast.demand.label("sales_demand"))
+        .outerjoin(models.SalesForecast, models.SalesForecast.product_id == models.Product.product_id)
+        .all()
+    )
+    sales = np.array([p.sales_demand for p in products], dtype=float)  # None -> NaN
+    forecasts = _forecasts(products, model, scaler, sales)
+    known = np.nan_to_num(forecasts, nan=0.0).tolist()
+    total = sum(known)
+    avg = total / len(known) if known else 1
+    prices = optimized_price_array([p.cost_price for p in products], [p.selling_price for p in products],
+                                   forecasts, avg)
+    # catalog demand as update_product counts it (sales_forecast.demand_for)
+    demand = np.where(np.isnan(sales),
+                      compute_demand_forecast_array([p.units_sold for p in products],
+                                                    [p.stock_available for p in products]),
+                      sales)
+
+    db.execute(delete(models.PricingSnapshot))
+    rows = [
+        {
+            "product_id": p.product_id,
+            "demand_forecast": None if f != f else f,  # NaN -> NULL
+            "optimized_price": price,
+            "model_version": model_version,
+        }
+        for p, f, price in zip(products, forecasts.tolist(), prices.tolist())
+    ]
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.execute(insert(models.PricingSnapshot), rows[i:i + CHUNK_SIZE])
+
+    stats = get_stats(db)
+    stats.forecast_sum = total
+    stats.forecast_count = len(known)
+    stats.demand_sum = sum(demand.tolist())
+    stats.demand_count = len(products)
+    stats.priced_avg = avg
+    stats.model_version = model_version
+    stats.catalog_version = (stats.catalog_version or 0) + 1
+    return len(rows)
+
+
+def _stale(db: Session) -> bool:
+    stats = db.get(models.CatalogStats, STATS_ID)
+    product_count = db.query(func.count(models.Product.product_id)).scalar()
+    return (stats is None
+            or stats.model_version != registry.version
+            or stats.forecast_count != product_count
+            or stats.demand_count != product_count)
+
+
+def ensure_fresh(db: Session):
+    # startup check - rebuild if the snapshot was built with another model or
+    # products were loaded behind its back (e.g. seed.py). Checked again under
+    # the model lock, so when several workers start only the first rebuilds
+    if not _stale(db):
+        return
+    with model_lock:
+        db.rollback()  # re-read what a worker that held the lock wrote
+        registry.load()  # and the model it may have published
+        if _stale(db):
+            model, scaler = registry.get()
+            rebuild(db, model, scaler, registry.version)
+
+
+def refresh_prices(db: Session, avg_forecast: float):
+    # re-price every product with a new catalog average (forecasts unchanged)
+    rows = db.query(
+        models.PricingSnapshot.product_id,
+        models.PricingSnapshot.demand_forecast,
+        models.Product.cost_price,
+        models.Product.selling_price,
+    ).join(models.Product, models.Product.product_id == models.PricingSnapshot.product_id).all()
+
+    prices = optimized_price_array([r.cost_price for r in rows], [r.selling_price for r in rows],
+                                   [r.demand_forecast for r in rows], avg_forecast)
+    updates = [{"product_id": r.product_id, "optimized_price": price} for r, price in zip(rows, prices.tolist())]
+    for i in range(0, len(updates), CHUNK_SIZE):
+        db.execute(update(models.PricingSnapshot), updates[i:i + CHUNK_SIZE])
+    db.query(models.CatalogStats).filter(models.CatalogStats.id == STATS_ID).update(
+        {"priced_avg": avg_forecast}, synchronize_session=False
+    )
+
+
+def _apply_delta(db: Session, forecast_delta: float, count_delta: int) -> models.CatalogStats:
+    # increment in SQL so concurrent writers don't lose updates
+    get_stats(db)
+    db.execute(
+        update(models.CatalogStats)
+        .where(models.CatalogStats.id == STATS_ID)
+        .values(
+            forecast_sum=models.CatalogStats.forecast_sum + forecast_delta,
+            forecast_count=models.CatalogStats.forecast_count + count_delta,
+        )
+    )
+    stats = db.get(models.CatalogStats, STATS_ID)
+    db.refresh(stats)
+    return stats
+
+
+def update_demand_stats(db: Session, demand_delta: float, count_delta: int) -> float:
+    # Apply a product write to the running compute_demand_forecast sum/count
+    # and return the new catalog avg_demand (1 for an empty catalog).
+    # Every product write goes through here, so it also bumps catalog_version.
+    get_stats(db)
+    db.execute(
+        update(models.CatalogStats)
+        .where(models.CatalogStats.id == STATS_ID)
+        .values(
+            demand_sum=models.CatalogStats.demand_sum + demand_delta,
+            demand_count=models.CatalogStats.demand_count + count_delta,
+            catalog_version=models.CatalogStats.catalog_version + 1,
+        )
+    )
+    demand_sum, demand_count = db.query(
+        models.CatalogStats.demand_sum, models.CatalogStats.demand_count
+    ).filter(models.CatalogStats.id == STATS_ID).one()
+    return demand_sum / demand_count if demand_count else 1
+
+
+def _drifted(avg: float, priced_avg) -> bool:
+    if priced_avg is None or priced_avg <= 0:
+        return True
+    return abs(avg - priced_avg) / priced_avg > PRICE_REFRESH_DRIFT
+
+
+def on_product_written(db: Session, product: models.Product):
+    # Call after create/update (product flushed, not committed yet) -
+    # O(1) apart from the rare drift triggered price refresh
+    model, scaler = registry.get()
+    sales = db.get(models.SalesForecast, product.product_id)
+    forecast = float(_forecasts([product], model, scaler, [sales.demand if sales is not None else None])[0])
+    if np.isnan(forecast):
+        forecast = None  # NULL + counts as 0, like _rebuild (NaN would poison forecast_sum)
+
+    snap = db.get(models.PricingSnapshot, product.product_id)
+    old_forecast = float(snap.demand_forecast or 0) if snap is not None else 0.0
+    stats = _apply_delta(db, (forecast or 0) - old_forecast, 0 if snap is not None else 1)
+
+    if snap is None:
+        snap = models.PricingSnapshot(product_id=product.product_id)
+        db.add(snap)
+    snap.demand_forecast = forecast
+    snap.model_version = registry.version
+
+    avg = stats.forecast_sum / stats.forecast_count if stats.forecast_count else 1
+    if _drifted(avg, stats.priced_avg):
+        db.flush()
+        refresh_prices(db, avg)
+        db.refresh(snap)
+    else:
+        snap.optimized_price = optimized_price(
+            float(product.cost_price), float(product.selling_price), forecast, stats.priced_avg
+        )
+
+
+def on_product_deleted(db: Session, product_id: int):
+    # Call before deleting the product row
+    snap = db.get(models.PricingSnapshot, product_id)
+    if snap is None:
+        return
+    stats = _apply_delta(db, -float(snap.demand_forecast or 0), -1)
+    db.delete(snap)
+
+    if stats.forecast_count and _drifted(stats.forecast_sum / stats.forecast_count, stats.priced_avg):
+        db.flush()
+        refresh_prices(db, stats.forecast_sum / stats.forecast_count)
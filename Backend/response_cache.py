@@ -0,0 +1,165 @@
+# Response cache for the catalog-wide read endpoints (/forecast, /optimized).
+#
+# Their output only changes when a product is written or the snapshot is
+# rebuilt (retrain / bulk import), both of which bump CatalogStats.catalog_version.
+# Responses are cached as rendered JSON under
+# <endpoint>:<catalog_version>:<model_version>, and the same version pair is sent
+# as the ETag, so a client holding the current one gets a 304 without a body.
+# The version is one PK lookup per request, which also keeps several workers
+# with their own in-process caches consistent.
+#
+# RESPONSE_CACHE_BACKEND: "memory" (LRU per process, default), "redis"
+# (shared, needs the `redis` package and RESPONSE_CACHE_URL) or "off".
+# The memory LRU is bounded by RESPONSE_CACHE_SIZE entries and by
+# RESPONSE_CACHE_MAX_MB of bodies - each entry is a full catalog response.
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+import models
+from pricing_snapshot import STATS_ID
+
+load_dotenv()
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 32))
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", 256))  # memory only
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 3600))  # redis only, old versions just expire
+KEY_PREFIX = "pot:response:"
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return  # would evict everything else and still not fit
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class RedisBackend:
+    def __init__(self, url: str, ttl: int):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(KEY_PREFIX + key)
+
+    def set(self, key: str, body: bytes):
+        self.client.set(KEY_PREFIX + key, body, ex=self.ttl)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=KEY_PREFIX + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, body):
+        pass
+
+    def clear(self):
+        pass
+
+
+def make_backend(name: str = RESPONSE_CACHE_BACKEND):
+    if name == "memory":
+        return MemoryBackend(RESPONSE_CACHE_SIZE, int(RESPONSE_CACHE_MAX_MB * 1024 * 1024))
+    if name == "redis":
+        return RedisBackend(RESPONSE_CACHE_URL, RESPONSE_CACHE_TTL)
+    if name == "off":
+        return NullBackend()
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {name}")
+
+
+backend = make_backend()
+
+
+def catalog_version(db: Session) -> Optional[str]:
+    # None until the snapshot exists - nothing is cached before that
+    row = db.query(models.CatalogStats.catalog_version, models.CatalogStats.model_version).filter(
+        models.CatalogStats.id == STATS_ID
+    ).first()
+    if row is None:
+        return None
+    return f"{row.catalog_version}-{row.model_version or 0}"
+
+
+def invalidate():
+    # called after product writes; older versions could never be served again
+    # anyway, this just frees them
+    backend.clear()
+
+
+def _etag(endpoint: str, version: str) -> str:
+    return f'"{endpoint}-{version}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
+
+def lookup(request: Request, endpoint: str, version: Optional[str]):
+    # -> (response or None, key). A response means the request is served
+    # (304 or cached body), otherwise render it and call store(key, body)
+    if version is None:
+        return None, None
+    etag = _etag(endpoint, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers), None
+    key = f"{endpoint}:{version}"
+    body = backend.get(key)
+    if body is not None:
+        return _json(body, headers), None
+    return None, key
+
+
+def store(endpoint: str, key: Optional[str], body: bytes) -> Response:
+    if key is None:
+        return _json(body, {})
+    backend.set(key, body)
+    return _json(body, {"ETag": _etag(endpoint, key.split(":", 1)[1]), "Cache-Control": "private, no-cache"})
+
+
+def _json(body: bytes, headers: dict) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,88 @@
+# Async version of auth_routes (served when DB_ASYNC=true)
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+import models, schemas, auth
+import email_service
+
+router = APIRouter(prefix="/api/auth", tags=["Auth"])
+
+
+async def _user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(models.User).filter(models.User.email == email))).scalars().first()
+
+
+@router.post("/register", response_model=schemas.Token, status_code=201)
+async def register(payload: schemas.UserRegister, db: AsyncSession = Depends(get_async_db)):
+    if await _user_by_email(db, payload.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    user = models.User(
+        username=payload.username,
+        email=payload.email,
+        hashed_password=await auth.hash_password_async(payload.password),
+        role=models.UserRole.buyer,  # always buyer — no self-assigning admin
+        is_verified=False,
+    )
+    db.add(user)
+    await db.flush()
+    verification_token = auth.create_verification_token(user.email)
+    email_service.enqueue_verification_email(db, user.email, user.username, verification_token)
+    await db.commit()
+    await db.refresh(user)
+    email_service.outbox.wake()
+
+    token = auth.create_user_token(user)
+    return {"access_token": token, "token_type": "bearer", "user": user}
+
+
+@router.post("/login", response_model=schemas.Token)
+async def login(payload: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await _user_by_email(db, payload.email)
+    if not user or not await auth.verify_password_async(payload.password, user.hashed_password):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not user.is_verified:
+        raise HTTPException(
+            status_code=403,
+            detail="Email not verified. Please check your inbox."
+        )
+
+    token = auth.create_user_token(user)
+    return {"access_token": token, "token_type": "bearer", "user": user}
+
+
+@router.get("/verify-email")
+async def verify_email(token: str, db: AsyncSession = Depends(get_async_db)):
+    email = auth.verify_verification_token(token)
+
+    user = await _user_by_email(db, email)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if user.is_verified:
+        return {"message": "Email already verified. You can login!"}
+
+    user.is_verified = True
+    await db.commit()
+    auth.user_cache.evict(user.id)
+    return {"message": "Email verified successfully! You can now login."}
+
+
+@router.get("/hash-pool")
+async def hash_pool_stats(_: models.User = Depends(auth.require_admin_async)):
+    return auth.hash_pool.stats()
+
+
+@router.get("/me", response_model=schemas.UserOut)
+async def me(
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # with JWT_STATELESS_AUTH current_user only carries the token claims
+    if current_user.username is None:
+        current_user = await db.get(models.User, current_user.id)
+        if current_user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+    return current_user
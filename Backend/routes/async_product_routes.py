@@ -0,0 +1,191 @@
+# Async version of product_routes (served when DB_ASYNC=true).
+# Same paths / responses, the queries go through the AsyncSession. Writes,
+# search and the elasticity solve reuse the sync helpers so the pricing logic
+# lives in one place - on the threadpool with a sync session (_in_threadpool),
+# since they can be CPU heavy (drift price refresh, search index build, catalog
+# solve, online model saves) and run_sync would run them on the event loop
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from database import get_async_db, AsyncSessionLocal, SessionLocal
+import models, schemas, auth
+import bulk_import
+import metrics
+import response_cache
+import price_optimizer
+from models import PermissionAction
+from routes.product_routes import (
+    EXPORT_BATCH_SIZE, FORECAST_STMT, OPTIMIZED_STMT, SQL_FORECAST_STMT, SQL_OPTIMIZED_STMT, _dump_rows, _solved_prices,
+    _parse_fields, _page_stmt, _page_response, _ndjson_lines,
+    _search_hits, _autocomplete, _create_product, _update_product, _delete_product, _bulk_import,
+)
+
+router = APIRouter(prefix="/api/products", tags=["Products"])
+
+
+def _with_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def _in_threadpool(fn, *args):
+    # fn(sync session, *args) on the threadpool
+    return await run_in_threadpool(_with_session, fn, *args)
+
+
+def _product_out(fn):
+    # serialize while the session is still open (it's closed before the response)
+    return lambda db, *args: schemas.ProductOut.model_validate(fn(db, *args))
+
+
+async def _ndjson_export(selected, search, category, cursor):
+    async with AsyncSessionLocal() as db:
+        last_id = cursor or 0
+        while True:
+            rows = (await db.execute(_page_stmt(selected, search, category, last_id, EXPORT_BATCH_SIZE))).all()
+            if not rows:
+                break
+            yield _ndjson_lines(rows, selected)
+            last_id = rows[-1].product_id
+            await db.rollback()
+
+
+@router.get("", response_model=List[schemas.ProductOut])
+async def list_products(
+    search: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="Return products with product_id > cursor"),
+    fields: Optional[str] = Query(None, description="Comma separated ProductOut fields"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    selected = _parse_fields(fields)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            _ndjson_export(selected, search, category, cursor), media_type="application/x-ndjson"
+        )
+
+    rows = (await db.execute(_page_stmt(selected, search, category, cursor, limit))).all()
+    return _page_response(rows, selected, limit)
+
+
+@router.get("/search", response_model=List[schemas.SearchHit])
+async def search_products(
+    q: str = Query(..., min_length=2),
+    category: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+):
+    return await _in_threadpool(_search_hits, q, limit, category)
+
+
+@router.get("/autocomplete", response_model=List[schemas.AutocompleteItem])
+async def autocomplete_products(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+):
+    return await _in_threadpool(_autocomplete, prefix, limit)
+
+
+@router.get("/forecast", response_model=List[schemas.ForecastItem])
+async def get_forecast(
+    request: Request,
+    mode: str = Query("snapshot", pattern="^(snapshot|sql)$",
+                      description="snapshot: ML forecasts, sql: formula computed by the database"),
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(auth.require_permission_async(PermissionAction.forecast_view)),
+):
+    endpoint, stmt = ("forecast-sql", SQL_FORECAST_STMT) if mode == "sql" else ("forecast", FORECAST_STMT)
+    with metrics.stage("get_forecast", "cache"):
+        cached, key = response_cache.lookup(request, endpoint, await db.run_sync(response_cache.catalog_version))
+    if cached is not None:
+        return cached
+    with metrics.stage("get_forecast", "query"):
+        result = await db.execute(stmt)
+    with metrics.stage("get_forecast", "fetch"):
+        rows = result.all()
+    with metrics.stage("get_forecast", "serialize"):
+        body = _dump_rows(schemas.ForecastItem, rows)
+    return response_cache.store(endpoint, key, body)
+
+
+@router.get("/optimized", response_model=Union[List[schemas.OptimizedItem], List[schemas.PriceSolution]])
+async def get_optimized(
+    request: Request,
+    mode: str = Query("formula", pattern="^(formula|elasticity|sql)$",
+                      description="formula: snapshot prices, elasticity: profit maximizing solver, "
+                                  "sql: formula prices computed by the database"),
+    objective: str = Query("profit", pattern="^(profit|revenue)$"),
+    elasticity_level: str = Query("product", pattern="^(product|category)$"),
+    min_margin: float = Query(price_optimizer.OPTIMIZER_MIN_MARGIN, ge=0, le=10),
+    max_change: float = Query(price_optimizer.OPTIMIZER_MAX_CHANGE, gt=0, le=1),
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(auth.require_permission_async(PermissionAction.optimize_view)),
+):
+    if mode == "elasticity":
+        return await _in_threadpool(
+            lambda s: _solved_prices(request, s, objective, elasticity_level, min_margin, max_change)
+        )
+    endpoint, stmt = ("optimized-sql", SQL_OPTIMIZED_STMT) if mode == "sql" else ("optimized", OPTIMIZED_STMT)
+    with metrics.stage("get_optimized", "cache"):
+        cached, key = response_cache.lookup(request, endpoint, await db.run_sync(response_cache.catalog_version))
+    if cached is not None:
+        return cached
+    with metrics.stage("get_optimized", "query"):
+        result = await db.execute(stmt)
+    with metrics.stage("get_optimized", "fetch"):
+        rows = result.all()
+    with metrics.stage("get_optimized", "serialize"):
+        body = _dump_rows(schemas.OptimizedItem, rows)
+    return response_cache.store(endpoint, key, body)
+
+
+@router.get("/{product_id}", response_model=schemas.ProductOut)
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    product = await db.get(models.Product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+
+@router.post("", response_model=schemas.ProductOut, status_code=201)
+async def create_product(
+    payload: schemas.ProductCreate,
+    current_user: models.User = Depends(auth.require_permission_async(PermissionAction.product_create)),
+):
+    return await _in_threadpool(_product_out(_create_product), payload, current_user.id)
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+async def bulk_import_products(
+    file: UploadFile = File(...),
+    upsert_key: Optional[str] = Query(None, pattern="^(product_id|name)$"),
+    chunk_size: int = Query(bulk_import.DEFAULT_CHUNK_SIZE, ge=100, le=500_000),
+    current_user: models.User = Depends(auth.require_permission_async(PermissionAction.product_create)),
+):
+    # CPU heavy (pandas / pyarrow)
+    return await _in_threadpool(_bulk_import, file, upsert_key, chunk_size, current_user.id)
+
+
+@router.put("/{product_id}", response_model=schemas.ProductOut)
+async def update_product(
+    product_id: int,
+    payload: schemas.ProductUpdate,
+    current_user: models.User = Depends(auth.require_permission_async(PermissionAction.product_update)),
+):
+    return await _in_threadpool(_product_out(_update_product), product_id, payload, current_user)
+
+
+@router.delete("/{product_id}", status_code=204)
+async def delete_product(
+    product_id: int,
+    _: models.User = Depends(auth.require_permission_async(PermissionAction.product_delete)),
+):
+    await _in_threadpool(_delete_product, product_id)
@@ -0,0 +1,88 @@
+# Async version of user_routes (served when DB_ASYNC=true)
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from database import get_async_db
+import models, schemas, auth
+from models import PermissionAction, UserRole
+from routes.user_routes import RoleUpdate
+
+router = APIRouter(prefix="/api/users", tags=["Users"])
+
+require_user_manage = auth.require_permission_async(PermissionAction.user_manage)
+
+
+async def _role_permission(db: AsyncSession, role: UserRole, action: PermissionAction):
+    stmt = select(models.RolePermission).filter(
+        models.RolePermission.role == role,
+        models.RolePermission.action == action,
+    )
+    return (await db.execute(stmt)).scalars().first()
+
+
+@router.get("", response_model=List[schemas.UserOut])
+async def list_users(
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(require_user_manage),
+):
+    return (await db.execute(select(models.User))).scalars().all()
+
+
+@router.patch("/{user_id}/role", response_model=schemas.UserOut)
+async def change_user_role(
+    user_id: int,
+    payload: RoleUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(require_user_manage),
+):
+    user = await db.get(models.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.role = payload.role
+    # issued tokens carry the old role claim, stop trusting them
+    await db.run_sync(lambda s: auth.bump_token_version(s, user))
+    await db.refresh(user)
+    return user
+
+
+@router.get("/permissions/{role}")
+async def get_role_permissions(
+    role: UserRole,
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(require_user_manage),
+):
+    stmt = select(models.RolePermission.action).filter(models.RolePermission.role == role)
+    return {"role": role, "permissions": (await db.execute(stmt)).scalars().all()}
+
+
+@router.post("/permissions/{role}/{action}")
+async def grant_permission(
+    role: UserRole,
+    action: models.PermissionAction,
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(require_user_manage),
+):
+    if await _role_permission(db, role, action):
+        return {"message": "Already granted"}
+    db.add(models.RolePermission(role=role, action=action))
+    await db.commit()
+    auth.permission_cache.invalidate()
+    return {"message": f"Granted '{action.value}' to role '{role.value}'"}
+
+
+@router.delete("/permissions/{role}/{action}")
+async def revoke_permission(
+    role: UserRole,
+    action: models.PermissionAction,
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(require_user_manage),
+):
+    perm = await _role_permission(db, role, action)
+    if not perm:
+        raise HTTPException(status_code=404, detail="Permission not found")
+    await db.delete(perm)
+    await db.commit()
+    auth.permission_cache.invalidate()
+    return {"message": f"Revoked '{action.value}' from role '{role.value}'"}
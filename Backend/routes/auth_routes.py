@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from database import get_db
 import models, schemas, auth
-from email_service import send_verification_email
+import email_service
 
 router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
@@ -21,13 +21,16 @@ def register(payload: schemas.UserRegister, db: Session = Depends(get_db)):
         is_verified=False,
     )
     db.add(user)
+    db.flush()
+    # generated verification token and queue the email in the same transaction,
+    # the outbox sender delivers it in the background (with retries)
+    verification_token = auth.create_verification_token(user.email)
+    email_service.enqueue_verification_email(db, user.email, user.username, verification_token)
     db.commit()
     db.refresh(user)
-    # generated verification token and sending email -
-    verification_token = auth.create_verification_token(user.email)
-    send_verification_email(user.email, user.username, verification_token)
+    email_service.outbox.wake()
 
-    token = auth.create_access_token({"sub": str(user.id)})
+    token = auth.create_user_token(user)
     return {"access_token": token, "token_type": "bearer", "user": user}
 
 @router.post("/login", response_model=schemas.Token)
@@ -42,7 +45,7 @@ def login(payload: schemas.UserLogin, db: Session = Depends(get_db)):
             detail="Email not verified. Please check your inbox."
         )
 
-    token = auth.create_access_token({"sub": str(user.id)})
+    token = auth.create_user_token(user)
     return {"access_token": token, "token_type": "bearer", "user": user}
 
 @router.get("/verify-email")
@@ -58,8 +61,19 @@ def verify_email(token: str, db: Session = Depends(get_db)):
 
     user.is_verified = True #this is where it marks as true for verified user
     db.commit()
+    auth.user_cache.evict(user.id)
     return {"message": "Email verified successfully! You can now login."}
 
+@router.get("/hash-pool")
+def hash_pool_stats(_: models.User = Depends(auth.require_admin)):
+    # queue depth / rejections of the bcrypt pool (see auth.HashPool)
+    return auth.hash_pool.stats()
+
 @router.get("/me", response_model=schemas.UserOut)
-def me(current_user: models.User = Depends(auth.get_current_user)):
+def me(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+    # with JWT_STATELESS_AUTH current_user only carries the token claims
+    if current_user.username is None:
+        current_user = db.query(models.User).filter(models.User.id == current_user.id).first()
+        if current_user is None:
+            raise HTTPException(status_code=404, detail="User not found")
     return current_user
\ No newline at end of file
@@ -0,0 +1,12 @@
+# Prometheus scrape endpoint (see metrics.py)
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+import metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
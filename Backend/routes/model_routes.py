@@ -0,0 +1,82 @@
+
+# Admin-only endpoints for the demand model.
+# training runs in a background worker, these just start / report jobs.
+
+import os
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+from database import get_db
+import models, schemas, auth
+import ml_model
+import pricing_snapshot
+import response_cache
+import training_jobs
+
+router = APIRouter(prefix="/api/models", tags=["Models"])
+
+
+@router.post("/train", response_model=schemas.TrainingJobOut, status_code=202)
+def train(_: models.User = Depends(auth.require_admin)):
+    # returns the already running job if there is one (no overlapping trainings)
+    return training_jobs.submit_training()
+
+
+@router.get("/train", response_model=List[schemas.TrainingJobOut])
+def list_training_jobs(_: models.User = Depends(auth.require_admin)):
+    return training_jobs.list_jobs()
+
+
+@router.get("/train/{job_id}", response_model=schemas.TrainingJobOut)
+def training_job_status(job_id: str, _: models.User = Depends(auth.require_admin)):
+    job = training_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+
+@router.get("/active")
+def active_model(_: models.User = Depends(auth.require_admin)):
+    model, _scaler = ml_model.registry.get()
+    return {"version": ml_model.registry.version, "loaded": model is not None}
+
+
+@router.get("/versions", response_model=List[schemas.ModelVersionOut])
+def model_versions(_: models.User = Depends(auth.require_admin)):
+    # saved artifacts (newest first), the last MODEL_KEEP_VERSIONS + the active one
+    active = ml_model.read_model_version()
+    versions = []
+    for version in ml_model.list_versions():
+        path = ml_model.artifact_path(version)
+        try:
+            meta = ml_model.read_metadata(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            continue  # pruned meanwhile
+        versions.append({
+            "version": version,
+            "created_at": datetime.fromtimestamp(meta["created_at"], timezone.utc),
+            "active": version == active,
+            "source": meta.get("source"),
+            "samples": meta.get("samples"),
+            "segments": meta["segment_count"],
+            "size_bytes": size,
+        })
+    return versions
+
+
+@router.post("/rollback/{version}")
+def rollback_model(version: str, db: Session = Depends(get_db), _: models.User = Depends(auth.require_admin)):
+    # re-activate a saved version; the other workers pick it up through the
+    # version file. With MODEL_ONLINE_UPDATES the next product write re-solves
+    # from the statistics again
+    if version not in ml_model.list_versions():
+        raise HTTPException(status_code=404, detail="Model version not found")
+    # waits for a training in flight, which would otherwise publish over it
+    with ml_model.model_lock:
+        ml_model.activate_version(version)
+        ml_model.registry.load()
+        pricing_snapshot.ensure_fresh(db)
+    response_cache.invalidate()
+    return {"version": ml_model.registry.version, "loaded": ml_model.registry.get()[0] is not None}
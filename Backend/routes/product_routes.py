@@ -1,116 +1,323 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from database import get_db
+from pydantic import TypeAdapter
+from typing import List, Optional, Union
+from typing_extensions import TypedDict
+from decimal import Decimal
+from datetime import datetime
+import functools
+import json
+from database import get_db, SessionLocal
 import models, schemas, auth
+import pricing_snapshot
+import metrics
+import online_model
+import sales
+import sales_forecast
+import response_cache
+import price_optimizer
+import ml_model
+import bulk_import
+import search as product_search
 from models import PermissionAction
-from ml_model import train_model, load_model, predict_demand
+from pricing import compute_demand_forecast, compute_optimized_price, demand_forecast_sql, optimized_price_sql
 
 router = APIRouter(prefix="/api/products", tags=["Products"])
 
 
-# Demand Forecast & Optimized Price Formula
+# Public routes all product list = no authentication required for now but can change in future
 
-def compute_demand_forecast(units_sold: int, stock_available: int) -> float:
-    
-    # Demand Forecast Formula:
-    # seasonal_factor = min(1.5, max(0.8, stock_available / units_sold))
-    # demand_forecast = units_sold * seasonal_factor
+PRODUCT_FIELDS = list(schemas.ProductOut.model_fields)
+EXPORT_BATCH_SIZE = 1000
 
-    # Logic:
-    # - High stock relative to sales → strong demand trajectory → factor trends up
-    # - Low stock relative to sales  → weak demand             → factor trends down
-    # - Clamped between 0.8 and 1.5 to prevent extreme values
-    units = units_sold or 1
-    stock = stock_available or 1
-    seasonal_factor = min(1.5, max(0.8, stock / units))
-    return round(units * seasonal_factor, 2)
 
+def _json_value(value):
+    # same JSON representation pydantic gives ProductOut (Decimal as string)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
 
-def compute_optimized_price(cost_price: float, selling_price: float,
-                             demand_forecast: float, avg_demand: float) -> float:
-    
-    # Optimized Price Formula:
-    # demand_factor = min(1.5, max(0.8, demand_forecast / avg_demand))
-    # optimized_price = cost_price + (selling_price - cost_price) * demand_factor
 
-    # Logic:
-    # - demand_factor > 1 → above avg demand → push price UP toward/above selling price
-    # - demand_factor < 1 → below avg demand → pull price DOWN toward cost price
-    # - Clamped between 0.8 and 1.5 to stay within a safe margin
-    
-    avg = avg_demand or 1
-    demand_factor = min(1.5, max(0.8, demand_forecast / avg))
-    optimized = cost_price + (selling_price - cost_price) * demand_factor
-    return round(optimized, 2)
+@functools.lru_cache(maxsize=256)
+def _row_adapter(schema, fields: tuple) -> TypeAdapter:
+    # List of TypedDicts with the schema's field types: pydantic-core dumps plain
+    # dicts to the same JSON the model would give, without building/validating models
+    row = TypedDict(f"{schema.__name__}Row", {f: schema.model_fields[f].annotation for f in fields})
+    return TypeAdapter(List[row])
+
+
+def _dump_rows(schema, rows, fields=None) -> bytes:
+    # rows are tuples starting with `fields` (default: all the schema's fields, in order)
+    fields = tuple(schema.model_fields if fields is None else fields)
+    return _row_adapter(schema, fields).dump_json([dict(zip(fields, r)) for r in rows])
+
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return PRODUCT_FIELDS
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def _filtered(q, search, category):
+    if search:
+        q = q.filter(models.Product.name.ilike(f"%{search}%"))
+    if category:
+        q = q.filter(models.Product.category == category)
+    return q
+
+
+def _columns(selected: List[str]):
+    # product_id is always fetched (for the cursor), last and only returned if selected
+    return [getattr(models.Product, f) for f in dict.fromkeys(selected + ["product_id"])]
+
+
+def _page_stmt(selected, search, category, cursor=None, limit=None):
+    stmt = _filtered(select(*_columns(selected)), search, category)
+    if cursor is not None:
+        stmt = stmt.filter(models.Product.product_id > cursor)
+    stmt = stmt.order_by(models.Product.product_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _ndjson_lines(rows, selected) -> str:
+    return "".join(json.dumps({f: _json_value(getattr(r, f)) for f in selected}) + "\n" for r in rows)
+
+
+def _page_response(rows, selected, limit):
+    headers = {}
+    if limit is not None and len(rows) == limit:
+        headers["X-Next-Cursor"] = str(rows[-1].product_id)
+    return Response(_dump_rows(schemas.ProductOut, rows, selected), media_type="application/json", headers=headers)
+
+
+def _ndjson_export(selected, search, category, cursor):
+    # Streams the catalog in keyset batches with its own session (the request
+    # session is closed before the body is streamed), so memory stays at one batch
+    db = SessionLocal()
+    try:
+        last_id = cursor or 0
+        while True:
+            rows = db.execute(_page_stmt(selected, search, category, last_id, EXPORT_BATCH_SIZE)).all()
+            if not rows:
+                break
+            yield _ndjson_lines(rows, selected)
+            last_id = rows[-1].product_id
+            db.rollback()  # end the read transaction between batches
+    finally:
+        db.close()
 
 
-# Public routes all product list = no authentication required for now but can change in future
 @router.get("", response_model=List[schemas.ProductOut])
 def list_products(
     search: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="Return products with product_id > cursor"),
+    fields: Optional[str] = Query(None, description="Comma separated ProductOut fields"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     db: Session = Depends(get_db),
 ):
-    q = db.query(models.Product)
-    if search:
-        q = q.filter(models.Product.name.ilike(f"%{search}%"))
-    if category:
-        q = q.filter(models.Product.category == category)
-    return q.order_by(models.Product.product_id).all()
+    # Without limit/cursor/fields this still returns the whole list (what the frontend uses),
+    # read as plain rows and dumped straight to JSON like the pages.
+    # - limit + cursor: keyset pagination on product_id, next cursor in X-Next-Cursor
+    # - fields: only these columns are selected and returned
+    # - format=ndjson: streamed full export, one product per line
+    selected = _parse_fields(fields)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            _ndjson_export(selected, search, category, cursor), media_type="application/x-ndjson"
+        )
+
+    rows = db.execute(_page_stmt(selected, search, category, cursor, limit)).all()
+    return _page_response(rows, selected, limit)
+
+
+def _search_hits(db: Session, q, limit, category):
+    # ranked search over name / description / category (see search.py)
+    hits = product_search.search_products(db, q, limit, category)
+    if not hits:
+        return []
+    rows = db.query(
+        models.Product.product_id, models.Product.name, models.Product.category, models.Product.selling_price,
+    ).filter(models.Product.product_id.in_([pid for pid, _ in hits])).all()
+    by_id = {r.product_id: r for r in rows}
+    return [
+        {**by_id[pid]._mapping, "score": score}
+        for pid, score in hits if pid in by_id
+    ]
+
+
+def _autocomplete(db: Session, prefix, limit):
+    return [{"product_id": pid, "name": name} for pid, name in product_search.autocomplete(db, prefix, limit)]
+
+
+@router.get("/search", response_model=List[schemas.SearchHit])
+def search_products(
+    q: str = Query(..., min_length=2),
+    category: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    return _search_hits(db, q, limit, category)
 
 
+@router.get("/autocomplete", response_model=List[schemas.AutocompleteItem])
+def autocomplete_products(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    return _autocomplete(db, prefix, limit)
+
+
+# plain reads of the materialized snapshot (see pricing_snapshot.py),
+# products missing from it fall back to their stored demand_forecast
+FORECAST_STMT = select(
+    models.Product.product_id,
+    models.Product.name,
+    models.Product.category,
+    models.Product.selling_price,
+    func.coalesce(models.PricingSnapshot.demand_forecast, models.Product.demand_forecast).label("demand_forecast"),
+).outerjoin(
+    models.PricingSnapshot, models.PricingSnapshot.product_id == models.Product.product_id
+).order_by(models.Product.product_id)
+
+# prices are kept up to date on product writes / retrains, so this is a plain read too
+OPTIMIZED_STMT = select(
+    models.Product.product_id,
+    models.Product.name,
+    models.Product.description,
+    models.Product.category,
+    models.Product.cost_price,
+    models.Product.selling_price,
+    models.PricingSnapshot.optimized_price,
+).outerjoin(
+    models.PricingSnapshot, models.PricingSnapshot.product_id == models.Product.product_id
+).order_by(models.Product.product_id)
+
+# mode=sql: no snapshot and no model. The database computes the demand (sales
+# history forecast, else the stock/sales formula) and prices it against the
+# catalog average of a window AVG() OVER (), so one query returns final prices
+SQL_DEMAND = func.coalesce(
+    models.SalesForecast.demand,
+    demand_forecast_sql(models.Product.units_sold, models.Product.stock_available),
+)
+
+SQL_FORECAST_STMT = select(
+    models.Product.product_id,
+    models.Product.name,
+    models.Product.category,
+    models.Product.selling_price,
+    SQL_DEMAND.label("demand_forecast"),
+).outerjoin(
+    models.SalesForecast, models.SalesForecast.product_id == models.Product.product_id
+).order_by(models.Product.product_id)
+
+SQL_OPTIMIZED_STMT = select(
+    models.Product.product_id,
+    models.Product.name,
+    models.Product.description,
+    models.Product.category,
+    models.Product.cost_price,
+    models.Product.selling_price,
+    optimized_price_sql(
+        models.Product.cost_price, models.Product.selling_price, SQL_DEMAND, func.avg(SQL_DEMAND).over()
+    ).label("optimized_price"),
+).outerjoin(
+    models.SalesForecast, models.SalesForecast.product_id == models.Product.product_id
+).order_by(models.Product.product_id)
+
+
+SOLUTION_ADAPTER = TypeAdapter(List[schemas.PriceSolution])
+
+
+def _render(adapter: TypeAdapter, rows) -> bytes:
+    # solver output (floats for the Decimal fields) still goes through validation
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+# both are served from response_cache while the catalog / model version is unchanged
+
 @router.get("/forecast", response_model=List[schemas.ForecastItem])
 def get_forecast(
+    request: Request,
+    mode: str = Query("snapshot", pattern="^(snapshot|sql)$",
+                      description="snapshot: ML forecasts, sql: formula computed by the database"),
     db: Session = Depends(get_db),
     _: models.User = Depends(auth.require_permission(PermissionAction.forecast_view)),
 ):
-    products = db.query(models.Product).all()
-    
-    model, scaler = load_model()
-    if model is None:
-        model, scaler = train_model(db)
-
-    results = []
-    for p in products:
-        ml_forecast = predict_demand(p, model, scaler)
-        results.append({
-            "product_id": p.product_id,
-            "name": p.name,
-            "category": p.category,
-            "selling_price": p.selling_price,
-            "demand_forecast": ml_forecast if ml_forecast else p.demand_forecast,
-        })
-    return results
-
-@router.get("/optimized", response_model=List[schemas.OptimizedItem])
+    endpoint, stmt = ("forecast-sql", SQL_FORECAST_STMT) if mode == "sql" else ("forecast", FORECAST_STMT)
+    with metrics.stage("get_forecast", "cache"):
+        cached, key = response_cache.lookup(request, endpoint, response_cache.catalog_version(db))
+    if cached is not None:
+        return cached
+    with metrics.stage("get_forecast", "query"):
+        result = db.execute(stmt)
+    with metrics.stage("get_forecast", "fetch"):
+        rows = result.all()
+    with metrics.stage("get_forecast", "serialize"):
+        body = _dump_rows(schemas.ForecastItem, rows)
+    return response_cache.store(endpoint, key, body)
+
+def _solved_prices(request: Request, db: Session, objective, level, min_margin, max_change):
+    # the solution depends on the live model too, not only the snapshot version.
+    # Only the default bounds are cached: each entry is a full catalog body,
+    # and client chosen floats in the key could fill the cache with them
+    endpoint = f"optimized-{objective}-{level}-{ml_model.registry.version}"
+    key = None
+    if (min_margin, max_change) == (price_optimizer.OPTIMIZER_MIN_MARGIN, price_optimizer.OPTIMIZER_MAX_CHANGE):
+        with metrics.stage("get_optimized", "cache"):
+            cached, key = response_cache.lookup(request, endpoint, response_cache.catalog_version(db))
+        if cached is not None:
+            return cached
+    try:
+        rows = price_optimizer.solve_catalog(db, objective, level, min_margin, max_change)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    with metrics.stage("get_optimized", "serialize"):
+        body = _render(SOLUTION_ADAPTER, rows)
+    return response_cache.store(endpoint, key, body)
+
+
+@router.get("/optimized", response_model=Union[List[schemas.OptimizedItem], List[schemas.PriceSolution]])
 def get_optimized(
+    request: Request,
+    mode: str = Query("formula", pattern="^(formula|elasticity|sql)$",
+                      description="formula: snapshot prices, elasticity: profit maximizing solver, "
+                                  "sql: formula prices computed by the database"),
+    objective: str = Query("profit", pattern="^(profit|revenue)$"),
+    elasticity_level: str = Query("product", pattern="^(product|category)$"),
+    min_margin: float = Query(price_optimizer.OPTIMIZER_MIN_MARGIN, ge=0, le=10),
+    max_change: float = Query(price_optimizer.OPTIMIZER_MAX_CHANGE, gt=0, le=1),
     db: Session = Depends(get_db),
     _: models.User = Depends(auth.require_permission(PermissionAction.optimize_view)),
 ):
-    products = db.query(models.Product).all()
-    model, scaler = load_model()
-    if model is None:
-        model, scaler = train_model(db)
-
-    # Computing ML forecasts for all products
-    forecasts = [predict_demand(p, model, scaler) or float(p.demand_forecast or 0) for p in products]
-    avg_forecast = sum(forecasts) / len(forecasts) if forecasts else 1
-
-    results = []
-    for p, forecast in zip(products, forecasts):
-        demand_factor = min(1.5, max(0.8, forecast / avg_forecast if avg_forecast > 0 else 1))
-        optimized_price = float(p.cost_price) + (float(p.selling_price) - float(p.cost_price)) * demand_factor
-        results.append({
-            "product_id": p.product_id,
-            "name": p.name,
-            "description": p.description,
-            "category": p.category,
-            "cost_price": p.cost_price,
-            "selling_price": p.selling_price,
-            "optimized_price": round(optimized_price, 2),
-        })
-    return results
+    if mode == "elasticity":
+        return _solved_prices(request, db, objective, elasticity_level, min_margin, max_change)
+    endpoint, stmt = ("optimized-sql", SQL_OPTIMIZED_STMT) if mode == "sql" else ("optimized", OPTIMIZED_STMT)
+    with metrics.stage("get_optimized", "cache"):
+        cached, key = response_cache.lookup(request, endpoint, response_cache.catalog_version(db))
+    if cached is not None:
+        return cached
+    with metrics.stage("get_optimized", "query"):
+        result = db.execute(stmt)
+    with metrics.stage("get_optimized", "fetch"):
+        rows = result.all()
+    with metrics.stage("get_optimized", "serialize"):
+        body = _dump_rows(schemas.OptimizedItem, rows)
+    return response_cache.store(endpoint, key, body)
 
 
 
@@ -124,12 +331,7 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
 
 # (auth + permission required) routes here = 
 
-@router.post("", response_model=schemas.ProductOut, status_code=201)
-def create_product(
-    payload: schemas.ProductCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_permission(PermissionAction.product_create)),
-):
+def _create_product(db: Session, payload: schemas.ProductCreate, user_id: int) -> models.Product:
     demand_forecast = compute_demand_forecast(payload.units_sold, payload.stock_available)
 
     # For new product, avg_demand = its own forecast
@@ -144,21 +346,60 @@ def create_product(
         **payload.model_dump(),
         demand_forecast=demand_forecast,
         optimized_price=optimized_price,
-        created_by=current_user.id,
+        created_by=user_id,
     )
     db.add(product)
+    db.flush()
+    new_sample = online_model.sample(product)
+    pricing_snapshot.update_demand_stats(db, demand_forecast, 1)
+    pricing_snapshot.on_product_written(db, product)
     db.commit()
+    online_model.absorb(db, new=new_sample)  # after commit, a rolled back write never reaches the model
+    response_cache.invalidate()
     db.refresh(product)
     return product
 
 
-@router.put("/{product_id}", response_model=schemas.ProductOut)
-def update_product(
-    product_id: int,
-    payload: schemas.ProductUpdate,
+@router.post("", response_model=schemas.ProductOut, status_code=201)
+def create_product(
+    payload: schemas.ProductCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_permission(PermissionAction.product_update)),
+    current_user: models.User = Depends(auth.require_permission(PermissionAction.product_create)),
+):
+    return _create_product(db, payload, current_user.id)
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+def bulk_import_products(
+    file: UploadFile = File(...),
+    upsert_key: Optional[str] = Query(None, pattern="^(product_id|name)$"),
+    chunk_size: int = Query(bulk_import.DEFAULT_CHUNK_SIZE, ge=100, le=500_000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.require_permission(PermissionAction.product_create)),
 ):
+    return _bulk_import(db, file, upsert_key, chunk_size, current_user.id)
+
+
+def _bulk_import(db: Session, file: UploadFile, upsert_key, chunk_size, user_id):
+    # CSV or Parquet (by file extension), streamed in chunks - see bulk_import.py
+    fmt = bulk_import.detect_format(file.filename or "")
+    try:
+        return bulk_import.import_products(
+            db, file.file, fmt, upsert_key=upsert_key, chunk_size=chunk_size, created_by=user_id,
+        )
+    except (ValueError, RuntimeError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError as e:
+        # e.g. a new product_id / name that clashes with a row outside the upsert key
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Import conflicts with existing data: {e.orig}")
+    finally:
+        response_cache.invalidate()
+
+
+def _update_product(db: Session, product_id: int, payload: schemas.ProductUpdate,
+                    current_user: models.User) -> models.Product:
     product = db.query(models.Product).filter(models.Product.product_id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -167,14 +408,17 @@ def update_product(
     if current_user.role == models.UserRole.supplier and product.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="Suppliers can only edit their own products")
 
+    old_demand = sales_forecast.demand_for(db, product)
+    old_sample = online_model.sample(product)
+
     for key, val in payload.model_dump(exclude_unset=True).items():
         setattr(product, key, val)
 
-    product.demand_forecast = compute_demand_forecast(product.units_sold, product.stock_available)
+    # sales history forecast if the product has one, else the formula
+    product.demand_forecast = sales_forecast.demand_for(db, product)
 
-    all_products = db.query(models.Product).all()
-    forecasts = [compute_demand_forecast(p.units_sold, p.stock_available) for p in all_products]
-    avg_demand = sum(forecasts) / len(forecasts) if forecasts else 1
+    # catalog avg from the maintained sum/count (O(1), no full table scan)
+    avg_demand = pricing_snapshot.update_demand_stats(db, float(product.demand_forecast) - old_demand, 0)
 
     product.optimized_price = compute_optimized_price(
         float(product.cost_price),
@@ -183,20 +427,44 @@ def update_product(
         avg_demand,
     )
 
+    db.flush()
+    new_sample = online_model.sample(product)
+    pricing_snapshot.on_product_written(db, product)
     db.commit()
+    online_model.absorb(db, old_sample, new_sample)
+    response_cache.invalidate()
     db.refresh(product)
     return product
 
 
-@router.delete("/{product_id}", status_code=204)
-def delete_product(
+@router.put("/{product_id}", response_model=schemas.ProductOut)
+def update_product(
     product_id: int,
+    payload: schemas.ProductUpdate,
     db: Session = Depends(get_db),
-    _: models.User = Depends(auth.require_permission(PermissionAction.product_delete)),
+    current_user: models.User = Depends(auth.require_permission(PermissionAction.product_update)),
 ):
+    return _update_product(db, product_id, payload, current_user)
+
+
+def _delete_product(db: Session, product_id: int):
     product = db.query(models.Product).filter(models.Product.product_id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    pricing_snapshot.update_demand_stats(db, -sales_forecast.demand_for(db, product), -1)
+    old_sample = online_model.sample(product)
+    pricing_snapshot.on_product_deleted(db, product_id)
+    sales.forget_product(db, product_id)
     db.delete(product)
     db.commit()
+    online_model.absorb(db, old=old_sample)
+    response_cache.invalidate()
+
 
+@router.delete("/{product_id}", status_code=204)
+def delete_product(
+    product_id: int,
+    db: Session = Depends(get_db),
+    _: models.User = Depends(auth.require_permission(PermissionAction.product_delete)),
+):
+    _delete_product(db, product_id)
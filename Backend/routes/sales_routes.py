@@ -0,0 +1,81 @@
+# Sales history: point of sale ingestion, aggregates and the sales based
+# demand forecasts (see sales.py / sales_forecast.py)
+
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from database import get_db, SessionLocal
+import models, schemas, auth
+import sales
+import sales_forecast
+from models import PermissionAction
+
+router = APIRouter(prefix="/api/sales", tags=["Sales"])
+
+SALES_MAX_BATCH = int(os.getenv("SALES_MAX_BATCH", 100_000))  # events per request
+
+EVENTS_ADAPTER = TypeAdapter(List[schemas.SalesEventIn])
+
+
+def _ingest_sync(events):
+    db = SessionLocal()
+    try:
+        return sales.ingest_events(db, events)
+    finally:
+        db.close()
+
+
+@router.post(
+    "/events",
+    response_model=schemas.SalesIngestResult,
+    status_code=201,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {
+        "schema": {"type": "array", "items": schemas.SalesEventIn.model_json_schema()},
+    }}}},
+)
+async def ingest_sales_events(
+    request: Request,
+    _: models.User = Depends(auth.require_permission(PermissionAction.product_update)),
+):
+    # JSON array of events. Parsed and validated straight from the raw body
+    # (pydantic-core, no intermediate dicts), the insert runs on the threadpool
+    try:
+        events = EVENTS_ADAPTER.validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    if len(events) > SALES_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {SALES_MAX_BATCH} events per batch")
+    if not events:
+        raise HTTPException(status_code=422, detail="No events")
+    return await run_in_threadpool(_ingest_sync, events)
+
+
+@router.get("/aggregates", response_model=List[schemas.SalesAggregate])
+def sales_aggregates(
+    product_id: Optional[int] = Query(None, description="Whole catalog if omitted"),
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    days: int = Query(28, ge=1, le=3660),
+    db: Session = Depends(get_db),
+    _: models.User = Depends(auth.require_permission(PermissionAction.forecast_view)),
+):
+    return sales.aggregates(db, product_id, granularity, days)
+
+
+@router.get("/forecast", response_model=List[schemas.SalesForecastOut])
+def sales_forecasts(
+    product_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    _: models.User = Depends(auth.require_permission(PermissionAction.forecast_view)),
+):
+    query = db.query(models.SalesForecast).order_by(models.SalesForecast.product_id)
+    if product_id is not None:
+        query = query.filter(models.SalesForecast.product_id == product_id)
+    return query.all()
+
+
+@router.post("/forecast/refresh", response_model=schemas.SalesForecastRefresh)
+def refresh_sales_forecasts(db: Session = Depends(get_db), _: models.User = Depends(auth.require_admin)):
+    return sales_forecast.refresh(db)
@@ -38,7 +38,8 @@ def change_user_role(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.role = payload.role
-    db.commit()
+    # issued tokens carry the old role claim, stop trusting them
+    auth.bump_token_version(db, user)
     db.refresh(user)
     return user
 
@@ -73,6 +74,7 @@ def grant_permission(
     perm = models.RolePermission(role=role, action=action)
     db.add(perm)
     db.commit()
+    auth.permission_cache.invalidate()
     return {"message": f"Granted '{action.value}' to role '{role.value}'"}
 
 
@@ -92,4 +94,5 @@ def revoke_permission(
         raise HTTPException(status_code=404, detail="Permission not found")
     db.delete(perm)
     db.commit()
+    auth.permission_cache.invalidate()
     return {"message": f"Revoked '{action.value}' from role '{role.value}'"}
\ No newline at end of file
@@ -0,0 +1,175 @@
+# Sales history store (POST /api/sales/events, GET /api/sales/aggregates).
+#
+# Point of sale batches are appended to sales_events as they come (never
+# updated) and rolled up into sales_daily (units / revenue per product and
+# day) in the same transaction, one upsert per (product, day) of the batch
+# instead of one per event. Aggregates and the forecasting engine
+# (sales_forecast.py) only read the rollup, so their cost depends on
+# products x days, not on the number of events.
+#
+# Timestamps are stored as naive UTC.
+
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, delete
+from sqlalchemy.orm import Session
+
+import models, schemas
+
+CHUNK_SIZE = 10_000
+ROLLING_WINDOW = {"day": 7, "week": 4}  # periods in rolling_units
+GRANULARITIES = tuple(ROLLING_WINDOW)
+MAX_UNKNOWN_REPORTED = 50
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _known_prices(db: Session, product_ids) -> dict:
+    # product_id -> selling_price for the ids that exist
+    prices = {}
+    for i in range(0, len(product_ids), CHUNK_SIZE):
+        chunk = product_ids[i:i + CHUNK_SIZE]
+        prices.update(db.query(models.Product.product_id, models.Product.selling_price)
+                      .filter(models.Product.product_id.in_(chunk)).all())
+    return prices
+
+
+def _upsert_daily(db: Session, rows: List[dict]):
+    # add the batch totals to the existing (product, day) rows
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(models.SalesDaily)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["product_id", "day"],
+            set_={
+                "units": models.SalesDaily.units + stmt.excluded.units,
+                "revenue": models.SalesDaily.revenue + stmt.excluded.revenue,
+                "events": models.SalesDaily.events + stmt.excluded.events,
+            },
+        )
+        for i in range(0, len(rows), CHUNK_SIZE):
+            db.execute(stmt, rows[i:i + CHUNK_SIZE])
+        return
+
+    # other databases: look the keys up, then bulk insert / increment
+    for row in rows:
+        existing = db.get(models.SalesDaily, (row["product_id"], row["day"]))
+        if existing is None:
+            db.add(models.SalesDaily(**row))
+        else:
+            existing.units += row["units"]
+            existing.revenue += row["revenue"]
+            existing.events += row["events"]
+
+
+def ingest_events(db: Session, events: List[schemas.SalesEventIn]) -> dict:
+    # Append one point of sale batch and update the daily rollup - commits.
+    # Events of unknown products are rejected, the rest are accepted
+    started = time.perf_counter()
+    frame = pd.DataFrame({
+        "product_id": np.fromiter((e.product_id for e in events), dtype=np.int64, count=len(events)),
+        "quantity": np.fromiter((e.quantity for e in events), dtype=np.int64, count=len(events)),
+        "unit_price": np.array([e.unit_price for e in events], dtype=float),  # None -> NaN
+        "sold_at": pd.to_datetime([e.sold_at for e in events], utc=True).tz_localize(None),
+    })
+
+    prices = _known_prices(db, frame["product_id"].unique().tolist())
+    known = frame["product_id"].isin(list(prices))
+    unknown = sorted(set(frame.loc[~known, "product_id"].tolist()))
+    frame = frame[known]
+
+    days_touched = 0
+    if len(frame):
+        missing = frame["unit_price"].isna()
+        frame.loc[missing, "unit_price"] = frame.loc[missing, "product_id"].map(prices).astype(float)
+        frame["unit_price"] = frame["unit_price"].round(2)
+
+        rows = [
+            {"product_id": pid, "quantity": qty, "unit_price": price, "sold_at": sold_at}
+            for pid, qty, price, sold_at in zip(frame["product_id"].tolist(), frame["quantity"].tolist(),
+                                               frame["unit_price"].tolist(), frame["sold_at"].dt.to_pydatetime())
+        ]
+        for i in range(0, len(rows), CHUNK_SIZE):
+            db.execute(insert(models.SalesEvent), rows[i:i + CHUNK_SIZE])
+
+        daily = (
+            frame.assign(day=frame["sold_at"].dt.date, revenue=frame["quantity"] * frame["unit_price"])
+            .groupby(["product_id", "day"], sort=True)  # sorted keys -> same lock order for concurrent batches
+            .agg(units=("quantity", "sum"), revenue=("revenue", "sum"), events=("quantity", "size"))
+            .reset_index()
+        )
+        daily["revenue"] = daily["revenue"].round(2)
+        _upsert_daily(db, [
+            {"product_id": pid, "day": day, "units": units, "revenue": revenue, "events": count}
+            for pid, day, units, revenue, count in zip(
+                daily["product_id"].tolist(), daily["day"].tolist(), daily["units"].tolist(),
+                daily["revenue"].tolist(), daily["events"].tolist())
+        ])
+        days_touched = len(daily)
+    db.commit()
+
+    seconds = time.perf_counter() - started
+    return {
+        "received": len(events),
+        "accepted": len(frame),
+        "rejected": len(events) - len(frame),
+        "unknown_products": unknown[:MAX_UNKNOWN_REPORTED],
+        "days_touched": days_touched,
+        "seconds": round(seconds, 3),
+        "events_per_second": round(len(events) / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def aggregates(db: Session, product_id: Optional[int] = None, granularity: str = "day",
+               days: int = 28, end: Optional[date] = None) -> List[dict]:
+    # Daily or weekly (Monday based) units / revenue of one product or the
+    # whole catalog over the last `days` days, with the rolling mean of the
+    # last 7 days / 4 weeks. Days without sales count as 0
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    end = end or _utc_today()
+    start = end - timedelta(days=days - 1)
+    if granularity == "week":
+        start -= timedelta(days=start.weekday())
+    window = ROLLING_WINDOW[granularity]
+    # enough earlier history for the first rolling values
+    history_start = start - timedelta(days=window * (7 if granularity == "week" else 1))
+
+    query = (
+        db.query(models.SalesDaily.day, func.sum(models.SalesDaily.units), func.sum(models.SalesDaily.revenue))
+        .filter(models.SalesDaily.day >= history_start, models.SalesDaily.day <= end)
+        .group_by(models.SalesDaily.day)
+    )
+    if product_id is not None:
+        query = query.filter(models.SalesDaily.product_id == product_id)
+    rows = query.all()
+
+    frame = pd.DataFrame(
+        {"units": [int(r[1]) for r in rows], "revenue": [float(r[2]) for r in rows]},
+        index=pd.DatetimeIndex([pd.Timestamp(r[0]) for r in rows]),
+    ).reindex(pd.date_range(history_start, end, freq="D"), fill_value=0)
+    if granularity == "week":
+        frame = frame.resample("W-MON", label="left", closed="left").sum()
+    frame["rolling_units"] = frame["units"].rolling(window, min_periods=1).mean().round(2)
+    frame = frame[frame.index >= pd.Timestamp(start)]
+
+    return [
+        {"period_start": ts.date(), "units": int(u), "revenue": round(r, 2), "rolling_units": float(ru)}
+        for ts, u, r, ru in zip(frame.index, frame["units"], frame["revenue"], frame["rolling_units"])
+    ]
+
+
+def forget_product(db: Session, product_id: int):
+    # sales rows of a deleted product (SQLite doesn't enforce ON DELETE CASCADE)
+    for table in (models.SalesForecast, models.SalesDaily, models.SalesEvent):
+        db.execute(delete(table).where(table.product_id == product_id))
@@ -0,0 +1,186 @@
+# Demand forecasting from the sales history (POST /api/sales/forecast/refresh).
+#
+# Replaces the stock/sales ratio formula (pricing.compute_demand_forecast)
+# for every product with at least SALES_MIN_HISTORY_DAYS of sales history:
+# - the last SALES_HISTORY_DAYS of sales_daily become one units matrix
+#   (products x days, 0 for days without sales), ending at the latest day
+#   with sales
+# - additive exponential smoothing with a weekly season (level + 7 day
+#   profile) runs over the days, each step on whole columns, so the whole
+#   catalog is one pass of SALES_HISTORY_DAYS vector updates
+# - the forecast is the expected units over the next SALES_HORIZON_DAYS
+#
+# The formula is on another scale (cumulative units_sold x seasonal factor)
+# and both end up in one catalog average, so each forecast is also stored as
+# `demand`: forecast x (formula demand / sales forecast, summed over the
+# forecasted products). The sales history decides how demand is spread over
+# those products, the formula's scale is kept, and the catalog average is
+# what it would be with the formula alone.
+#
+# Forecasts are stored in sales_forecasts (the raw units forecast is what
+# /api/sales/forecast returns). `demand` becomes the products' demand_forecast
+# (the training target of the demand model), the demand used for the catalog
+# average in update_product and the forecast of the pricing snapshot.
+# Products without enough history keep the formula.
+
+import os
+import time
+
+import numpy as np
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.orm import Session
+
+import models
+import online_model
+import pricing_snapshot
+import response_cache
+from ml_model import model_lock, registry
+from pricing import compute_demand_forecast, compute_demand_forecast_array, round2
+
+SALES_HISTORY_DAYS = int(os.getenv("SALES_HISTORY_DAYS", 84))        # 12 weeks
+SALES_HORIZON_DAYS = int(os.getenv("SALES_HORIZON_DAYS", 30))
+SALES_MIN_HISTORY_DAYS = int(os.getenv("SALES_MIN_HISTORY_DAYS", 14))
+SALES_ALPHA = float(os.getenv("SALES_ALPHA", 0.3))   # level smoothing
+SALES_GAMMA = float(os.getenv("SALES_GAMMA", 0.1))   # seasonal smoothing
+SEASON_DAYS = 7
+
+CHUNK_SIZE = 10_000
+ROW_BLOCK = 16_384  # SKUs smoothed together
+
+
+def daily_matrix(db: Session, end, history_days: int = SALES_HISTORY_DAYS):
+    # -> (product ids, units matrix products x days) of the days up to `end`
+    first = np.datetime64(end, "D") - (history_days - 1)
+    rows = (
+        db.query(models.SalesDaily.product_id, models.SalesDaily.day, models.SalesDaily.units)
+        .filter(models.SalesDaily.day >= first.astype(object), models.SalesDaily.day <= end)
+        .all()
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((0, history_days))
+    product_ids, days, units = zip(*rows)
+    ids, row = np.unique(np.array(product_ids, dtype=np.int64), return_inverse=True)
+    col = (np.array(days, dtype="datetime64[D]") - first).astype(np.int64)
+    Y = np.zeros((len(ids), history_days))
+    Y[row, col] = units  # (product, day) is unique in sales_daily
+    return ids, Y
+
+
+def first_sale(Y: np.ndarray) -> np.ndarray:
+    # column of each product's first day with sales (0 for none)
+    return np.argmax(Y > 0, axis=1)
+
+
+def forecast_units(Y: np.ndarray, start: np.ndarray, horizon: int = SALES_HORIZON_DAYS,
+                   alpha: float = SALES_ALPHA, gamma: float = SALES_GAMMA,
+                   period: int = SEASON_DAYS) -> np.ndarray:
+    # Expected total units over the next `horizon` days per row. Each row's
+    # series starts at its `start` column (needs at least one full period).
+    # Blocks of rows keep the per step vectors in cache (~2x faster at 1M SKUs)
+    return np.concatenate([np.zeros(0)] + [
+        _smooth(Y[i:i + ROW_BLOCK], start[i:i + ROW_BLOCK], horizon, alpha, gamma, period)
+        for i in range(0, len(Y), ROW_BLOCK)
+    ])
+
+
+def _smooth(Y, start, horizon, alpha, gamma, period):
+    # level / season are initialized from each row's first period, then smoothed
+    n, days = Y.shape
+    first_period = start[:, None] + np.arange(period)
+    initial = np.take_along_axis(Y, first_period, axis=1)
+    level = initial.mean(axis=1)
+    season = np.zeros((period, n))  # day of week major, so every step reads contiguous rows
+    season[first_period.T % period, np.arange(n)] = (initial - level[:, None]).T
+
+    days_major = np.ascontiguousarray(Y.T)
+    for t in range(days):
+        # rows still inside their first period keep the initial values
+        a = np.where(t >= start + period, alpha, 0.0)
+        g = np.where(t >= start + period, gamma, 0.0)
+        s = season[t % period]
+        new_level = level + a * (days_major[t] - s - level)
+        s += g * (days_major[t] - new_level - s)  # in place
+        level = new_level
+
+    ahead = np.arange(days, days + horizon) % period
+    return np.clip(level + season[ahead], 0, None).sum(axis=0)
+
+
+def demand_for(db: Session, product: models.Product) -> float:
+    # demand of one product as the catalog stats count it: the sales history
+    # forecast if it has one, else the formula
+    stored = db.get(models.SalesForecast, product.product_id)
+    if stored is not None and stored.demand is not None:
+        return float(stored.demand)
+    return compute_demand_forecast(product.units_sold, product.stock_available)
+
+
+def _formula_demand(db: Session, product_ids: list) -> dict:
+    # product_id -> compute_demand_forecast
+    out = {}
+    for i in range(0, len(product_ids), CHUNK_SIZE):
+        rows = (db.query(models.Product.product_id, models.Product.units_sold, models.Product.stock_available)
+                .filter(models.Product.product_id.in_(product_ids[i:i + CHUNK_SIZE])).all())
+        formula = compute_demand_forecast_array([r.units_sold for r in rows], [r.stock_available for r in rows])
+        out.update(zip([r.product_id for r in rows], formula.tolist()))
+    return out
+
+
+def refresh(db: Session) -> dict:
+    # Re-forecast every product from the sales history, then rebuild the
+    # pricing snapshot / catalog stats and reset the online model statistics
+    # (the training target changed) - commits. Runs under the model lock like
+    # a training job, so it can't interleave with one rebuilding the snapshot
+    with model_lock:
+        db.rollback()  # read what a worker that held the lock committed
+        registry.load()  # and price with the model it may have published
+        return _refresh(db)
+
+
+def _refresh(db: Session) -> dict:
+    started = time.perf_counter()
+    previous = {pid for (pid,) in db.query(models.SalesForecast.product_id).all()}
+    end = db.query(func.max(models.SalesDaily.day)).scalar()
+
+    ids, Y = daily_matrix(db, end) if end is not None else (np.empty(0, dtype=np.int64), None)
+    forecasts = []
+    if len(ids):
+        start = first_sale(Y)
+        keep = SALES_HISTORY_DAYS - start >= max(SALES_MIN_HISTORY_DAYS, SEASON_DAYS)
+        ids, Y, start = ids[keep], Y[keep], start[keep]
+        units = round2(forecast_units(Y, start))
+        formula = _formula_demand(db, ids.tolist())
+        formula_total = sum(formula.get(pid, 0.0) for pid in ids.tolist())
+        scale = formula_total / units.sum() if units.sum() > 0 else 1.0
+        forecasts = [
+            {"product_id": pid, "forecast": f, "demand": d, "horizon_days": SALES_HORIZON_DAYS,
+             "history_days": SALES_HISTORY_DAYS - s}
+            for pid, f, d, s in zip(ids.tolist(), units.tolist(), round2(units * scale).tolist(), start.tolist())
+        ]
+
+    db.execute(delete(models.SalesForecast))
+    for i in range(0, len(forecasts), CHUNK_SIZE):
+        chunk = forecasts[i:i + CHUNK_SIZE]
+        db.execute(insert(models.SalesForecast), chunk)
+        db.execute(update(models.Product), [
+            {"product_id": r["product_id"], "demand_forecast": r["demand"]} for r in chunk
+        ])
+
+    # products that lost their forecast (no sales in the window) go back to the formula
+    dropped = _formula_demand(db, list(previous - set(ids.tolist())))
+    rows = [{"product_id": pid, "demand_forecast": f} for pid, f in dropped.items()]
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.execute(update(models.Product), rows[i:i + CHUNK_SIZE])
+
+    model, scaler = registry.get()
+    pricing_snapshot.rebuild(db, model, scaler, registry.version)
+    online_model.reset(db)
+    response_cache.invalidate()
+
+    return {
+        "forecasted": len(forecasts),
+        "products": db.query(func.count(models.Product.product_id)).scalar(),
+        "history_days": SALES_HISTORY_DAYS,
+        "horizon_days": SALES_HORIZON_DAYS,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 from models import UserRole
 
 
@@ -78,6 +78,21 @@ class ProductOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class BulkImportError(BaseModel):
+    row: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    rows_read: int
+    inserted: int
+    updated: int
+    rejected: int
+    errors: List[BulkImportError]  # first 50 rejected rows
+    seconds: float
+    rows_per_second: Optional[float]
+
+
 # Forecast & Optimization Schemas 
 class ForecastItem(BaseModel):
     product_id: int
@@ -98,4 +113,89 @@ class OptimizedItem(BaseModel):
     selling_price: Decimal
     optimized_price: Optional[Decimal]
 
-    model_config = {"from_attributes": True}
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+
+class PriceSolution(OptimizedItem):
+    # /optimized?mode=elasticity (see price_optimizer.py)
+    demand_forecast: Optional[float]       # predicted demand at the current price
+    expected_demand: Optional[float]       # predicted demand at optimized_price
+    elasticity: Optional[float]            # point price elasticity at the current price
+    expected_objective: Optional[float]    # profit (or revenue) at optimized_price
+
+
+# Sales Schemas
+class SalesEventIn(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+    unit_price: Optional[Decimal] = Field(None, ge=0)  # defaults to the product's selling_price
+    sold_at: datetime  # naive = UTC
+
+
+class SalesIngestResult(BaseModel):
+    received: int
+    accepted: int
+    rejected: int
+    unknown_products: List[int]  # first 50
+    days_touched: int            # (product, day) rollup rows written
+    seconds: float
+    events_per_second: Optional[float]
+
+
+class SalesAggregate(BaseModel):
+    period_start: date
+    units: int
+    revenue: Decimal
+    rolling_units: float  # mean units of the last 7 days / 4 weeks
+
+
+class SalesForecastOut(BaseModel):
+    product_id: int
+    forecast: Decimal
+    horizon_days: int
+    history_days: int
+    updated_at: Optional[datetime]
+
+    model_config = {"from_attributes": True}
+
+
+class SalesForecastRefresh(BaseModel):
+    forecasted: int    # products with enough history
+    products: int
+    history_days: int
+    horizon_days: int
+    seconds: float
+
+
+# Model training Schemas
+class TrainingJobOut(BaseModel):
+    job_id: str
+    status: str  # running / succeeded / failed
+    created_at: datetime
+    finished_at: Optional[datetime]
+    model_version: Optional[str]
+    error: Optional[str]
+
+
+class ModelVersionOut(BaseModel):
+    version: str
+    created_at: datetime
+    active: bool
+    source: Optional[str]   # training / online
+    samples: Optional[int]
+    segments: int           # category models besides the global one
+    size_bytes: int
+
+
+# Search Schemas
+class SearchHit(BaseModel):
+    product_id: int
+    name: str
+    category: Optional[str]
+    selling_price: Decimal
+    score: float
+
+
+class AutocompleteItem(BaseModel):
+    product_id: int
+    name: str
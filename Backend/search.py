@@ -0,0 +1,212 @@
+# Product search and name autocomplete.
+#
+# PostgreSQL: ranked full text (tsvector) + trigram word similarity over
+# name / description / category, backed by the GIN indexes created in
+# migrations/versions/0001_product_search_indexes.py.
+#
+# Other databases (SQLite in local / test setups): an in-memory trigram
+# index built from the products table. When catalog_version (bumped on every
+# product write, checked with one PK lookup per search) moves, searches keep
+# using the current index while a background thread builds the new one and
+# swaps it in - only the very first search of a process builds inline.
+
+import bisect
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import desc, func, literal, literal_column, or_, text
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+# Product search document - the 0001 migration indexes the exact same
+# expression, change both together or PostgreSQL won't use the index
+SEARCH_DOCUMENT_SQL = "coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(category, '')"
+SEARCH_TSVECTOR_SQL = f"to_tsvector('simple', {SEARCH_DOCUMENT_SQL})"
+
+SIMILARITY_THRESHOLD = 0.3  # same default as pg_trgm's `%` operator
+BUILD_BATCH_SIZE = 10_000
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def trigrams(text: str) -> set:
+    # pg_trgm style: lowercase words padded with two spaces in front, one behind
+    grams = set()
+    for word in _WORD_RE.findall((text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class NgramIndex:
+    # Inverted trigram index: trigram -> array of row positions.
+    # Scoring counts, per row, how many of the query's trigrams it contains
+    # (np.bincount over the posting lists) and divides by the number of query
+    # trigrams, i.e. how much of the query is found in the product.
+
+    def __init__(self):
+        self.built = False  # version can legitimately be None (no catalog_stats row yet)
+        self.version = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._names = []
+        self._categories = []
+        self._postings = {}
+        self._sorted_names = []  # (lower name, position) for prefix lookups
+
+    def __len__(self):
+        return len(self._ids)
+
+    def build(self, rows, version=None):
+        # rows: iterable of (product_id, name, description, category)
+        ids, names, categories = [], [], []
+        postings = defaultdict(list)
+        for pos, (product_id, name, description, category) in enumerate(rows):
+            ids.append(product_id)
+            names.append(name)
+            categories.append(category)
+            for gram in trigrams(f"{name} {description or ''} {category or ''}"):
+                postings[gram].append(pos)
+
+        self._ids = np.array(ids, dtype=np.int64)
+        self._names = names
+        self._categories = categories
+        self._postings = {g: np.array(p, dtype=np.int32) for g, p in postings.items()}
+        self._sorted_names = sorted(((n or "").lower(), i) for i, n in enumerate(names))
+        self.version = version
+        self.built = True
+
+    def search(self, query: str, limit: int = 20, category=None, threshold: float = SIMILARITY_THRESHOLD):
+        # returns [(product_id, score)] best first
+        query_grams = trigrams(query)
+        lists = [self._postings[g] for g in query_grams if g in self._postings]
+        if not lists or not len(self._ids):
+            return []
+        counts = np.bincount(np.concatenate(lists), minlength=len(self._ids))
+        scores = counts / len(query_grams)
+        candidates = np.nonzero(scores >= threshold)[0]
+        if category is not None:
+            candidates = [i for i in candidates if self._categories[i] == category]
+        best = heapq.nlargest(limit, candidates, key=lambda i: (scores[i], -self._ids[i]))
+        return [(int(self._ids[i]), round(float(scores[i]), 4)) for i in best]
+
+    def autocomplete(self, prefix: str, limit: int = 10):
+        # returns [(product_id, name)] ordered by name
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._sorted_names, (prefix, -1))
+        out = []
+        for name, pos in self._sorted_names[start:]:
+            if not name.startswith(prefix) or len(out) >= limit:
+                break
+            out.append((int(self._ids[pos]), self._names[pos]))
+        return out
+
+
+_index = NgramIndex()
+_index_lock = threading.Lock()
+_rebuilding = False
+
+
+def _catalog_version(db: Session):
+    return db.query(models.CatalogStats.catalog_version).filter(models.CatalogStats.id == 1).scalar()
+
+
+def _stream_rows(db: Session):
+    # keyset batches so building the index doesn't load the whole table at once
+    last_id = 0
+    while True:
+        batch = db.query(
+            models.Product.product_id, models.Product.name,
+            models.Product.description, models.Product.category,
+        ).filter(models.Product.product_id > last_id).order_by(
+            models.Product.product_id
+        ).limit(BUILD_BATCH_SIZE).all()
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1].product_id
+
+
+def _build(db: Session) -> NgramIndex:
+    # version read before the rows: a write landing mid-build leaves the
+    # index one version behind, so the next search rebuilds again
+    index = NgramIndex()
+    index.build(_stream_rows(db), _catalog_version(db))
+    return index
+
+
+def _rebuild_in_background():
+    global _index, _rebuilding
+    db = SessionLocal()
+    try:
+        _index = _build(db)
+    except Exception as e:
+        print(f"Search index rebuild failed: {e}")
+    finally:
+        db.close()
+        _rebuilding = False
+
+
+def get_index(db: Session) -> NgramIndex:
+    global _index, _rebuilding
+    version = _catalog_version(db)
+    if not _index.built:
+        with _index_lock:
+            if not _index.built:
+                _index = _build(db)
+    elif _index.version != version:
+        # stale by a few writes: serve it, one thread builds the new one
+        with _index_lock:
+            if _rebuilding:
+                return _index
+            _rebuilding = True
+        threading.Thread(target=_rebuild_in_background, name="search-index", daemon=True).start()
+    return _index
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def search_products(db: Session, q: str, limit: int = 20, category=None):
+    # ranked [(product_id, score)]
+    if _is_postgres(db):
+        doc = literal_column(SEARCH_DOCUMENT_SQL)
+        tsv = literal_column(SEARCH_TSVECTOR_SQL)
+        tsq = func.plainto_tsquery(literal_column("'simple'"), q)
+        # word similarity: the best matching stretch of the document, not the
+        # whole document, so a typo in one word still clears the threshold
+        # (same idea as the in-memory index's "fraction of the query found")
+        db.execute(
+            text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+            {"t": str(SIMILARITY_THRESHOLD)},
+        )
+        score = (func.ts_rank(tsv, tsq) + func.word_similarity(q, doc)).label("score")
+        query = db.query(models.Product.product_id, score).filter(
+            or_(tsv.op("@@")(tsq), literal(q).op("<%")(doc))
+        )
+        if category:
+            query = query.filter(models.Product.category == category)
+        rows = query.order_by(desc("score"), models.Product.product_id).limit(limit).all()
+        return [(r.product_id, round(float(r.score), 4)) for r in rows]
+
+    return get_index(db).search(q, limit, category)
+
+
+def autocomplete(db: Session, prefix: str, limit: int = 10):
+    # [(product_id, name)] whose name starts with prefix
+    if _is_postgres(db):
+        rows = db.query(models.Product.product_id, models.Product.name).filter(
+            models.Product.name.ilike(_escape_like(prefix) + "%", escape="\\")
+        ).order_by(models.Product.name, models.Product.product_id).limit(limit).all()
+        return [(r.product_id, r.name) for r in rows]
+
+    return get_index(db).autocomplete(prefix, limit)
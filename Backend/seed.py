@@ -5,7 +5,8 @@ from database import SessionLocal, engine
 import models
 from auth import hash_password
 import pandas as pd
-from decimal import Decimal
+from sqlalchemy import insert
+from pricing import price_frame
 
 models.Base.metadata.create_all(bind=engine)
 db = SessionLocal()
@@ -56,6 +57,8 @@ else:
     print("Admin user already exists")
 
 # Product data = from CSV
+PRODUCT_COLUMNS = ["name", "description", "cost_price", "selling_price", "category", "stock_available",
+                   "units_sold", "customer_rating", "demand_forecast", "optimized_price"]
 csv_path = os.path.join(os.path.dirname(__file__), "product_data.csv")
 if not os.path.exists(csv_path):
     csv_path = "product_data.csv"
@@ -63,20 +66,21 @@ if not os.path.exists(csv_path):
 try:
     df = pd.read_csv(csv_path)
     if db.query(models.Product).count() == 0:
-        for _, row in df.iterrows():
-            db.add(models.Product(
-                name=row["name"],
-                description=row.get("description"),
-                cost_price=Decimal(str(row["cost_price"])),
-                selling_price=Decimal(str(row["selling_price"])),
-                category=row.get("category"),
-                stock_available=int(row.get("stock_available", 0)),
-                units_sold=int(row.get("units_sold", 0)),
-                customer_rating=Decimal(str(row["customer_rating"])) if pd.notna(row.get("customer_rating")) else None,
-                demand_forecast=Decimal(str(row["demand_forecast"])) if pd.notna(row.get("demand_forecast")) else None,
-                optimized_price=Decimal(str(row["optimized_price"])) if pd.notna(row.get("optimized_price")) else None,
-                created_by=admin_id,
-            ))
+        for col in ("description", "category", "customer_rating", "demand_forecast", "optimized_price"):
+            if col not in df.columns:
+                df[col] = None
+        df[["stock_available", "units_sold"]] = df[["stock_available", "units_sold"]].fillna(0).astype(int)
+
+        # rows without forecast / price get them from the pricing engine (one pass over the columns)
+        forecasts, prices = price_frame(df)
+        df["demand_forecast"] = df["demand_forecast"].fillna(pd.Series(forecasts, index=df.index))
+        df["optimized_price"] = df["optimized_price"].fillna(pd.Series(prices, index=df.index))
+
+        df = df[PRODUCT_COLUMNS].astype(object).where(df[PRODUCT_COLUMNS].notna(), None)
+        rows = df.to_dict("records")
+        for row in rows:
+            row["created_by"] = admin_id
+        db.execute(insert(models.Product), rows)
         db.commit()
         print(f"Seeded {len(df)} products")
     else:
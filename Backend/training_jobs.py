@@ -0,0 +1,240 @@
+# Background training of the demand model.
+#
+# Training used to run inside whichever request first found no pickle on disk.
+# Now it runs in a separate worker process so request latency never depends
+# on it:
+# - submit_training() returns a job id right away
+# - only one job runs at a time, concurrent triggers get the
+#   id of the job that is already in flight (dedup)
+# - the worker writes the artifacts with ml_model.save_model (atomic rename +
+#   version stamp) and rebuilds the pricing snapshot, then this process
+#   reloads its registry
+# - with several server workers each has its own job queue, so the training
+#   runs under ml_model.model_lock: a job that waited on another worker's
+#   training reuses that model instead of training again
+# - jobs are rows in training_jobs, so a status poll can land on any worker
+# - the worker process comes from a forkserver (or spawn), never a fork of the
+#   threaded server process (outbox / threadpool / search rebuild threads)
+# - the same worker publishes online model refreshes (online_model.publish)
+#   when a product write drifted the coefficients, so the request that noticed
+#   never waits on model_lock or re-forecasts the catalog itself
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import metrics
+import ml_model
+import models
+import online_model
+import pricing_snapshot
+import response_cache
+from database import SessionLocal
+
+TRAIN_START_METHOD = os.getenv(
+    "TRAIN_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_executor = None
+_lock = threading.Lock()
+_active_job_id = None  # this process' job in flight
+_refresh_running = False  # this process' online refresh in flight
+_refresh_again = False  # another write drifted while it ran
+
+MAX_JOB_HISTORY = 50
+
+
+def _run_training(requested_at: float, if_missing: bool = False):
+    # runs inside the worker process
+    # -> (version, stage timings); the timings go back to the server process
+    # since this process' metrics are never scraped
+    with ml_model.model_lock:
+        # if_missing (startup): any model will do, else one another worker
+        # trained on data read after this job was requested
+        existing = ml_model.read_model_version() if if_missing else ml_model.trained_since(requested_at)
+        if existing is not None:
+            print(f"Model {existing} was trained by another worker, not training again")
+            return existing, {}
+        return _train_and_publish()
+
+
+def _train_and_publish():
+    db = SessionLocal()
+    try:
+        with metrics.trace() as trace:
+            model, scaler = ml_model.train_model(db)
+            version = ml_model.read_model_version() if model is not None else None
+            if model is not None:
+                online_model.reset(db)
+            # re-forecast + re-price the catalog with the new model
+            # (or with the stored forecasts if there wasn't enough data)
+            pricing_snapshot.rebuild(db, model, scaler, version)
+        if model is None:
+            raise RuntimeError("Not enough data to train model")
+        return version, dict(trace.stages)
+    finally:
+        db.close()
+
+
+def _run_online_refresh():
+    # runs inside the worker process -> (version, stage timings)
+    db = SessionLocal()
+    try:
+        with metrics.trace() as trace:
+            version = online_model.publish(db)
+        return version, dict(trace.stages)
+    finally:
+        db.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context(TRAIN_START_METHOD)
+        )
+    return _executor
+
+
+def _now():
+    # naive UTC, like the TIMESTAMP columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _as_dict(job: models.TrainingJob) -> dict:
+    def utc(value):
+        return value.replace(tzinfo=timezone.utc) if value is not None else None
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "created_at": utc(job.created_at),
+        "finished_at": utc(job.finished_at),
+        "model_version": job.model_version,
+        "error": job.error,
+    }
+
+
+def _finish(job_id, **values):
+    db = SessionLocal()
+    try:
+        db.query(models.TrainingJob).filter(models.TrainingJob.job_id == job_id).update(
+            dict(values, finished_at=_now())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _on_done(job_id, future):
+    global _active_job_id
+    try:
+        version, stages = future.result()
+        metrics.record_stages(stages)
+        # pick up the freshly published artifacts in this process
+        ml_model.registry.load()
+        response_cache.invalidate()
+        _finish(job_id, status="succeeded", model_version=version)
+    except Exception as e:
+        _finish(job_id, status="failed", error=str(e))
+    finally:
+        with _lock:
+            if _active_job_id == job_id:
+                _active_job_id = None
+
+
+def submit_training(if_missing: bool = False) -> dict:
+    # if_missing: only train if no worker has published a model by the time
+    # the job runs (first boot of several workers)
+    global _active_job_id
+    with _lock:
+        if _active_job_id is not None:
+            job = get_job(_active_job_id)
+            if job is not None:
+                return job
+
+        # single worker + one job in flight, so a new job starts right away
+        db = SessionLocal()
+        try:
+            row = models.TrainingJob(job_id=uuid.uuid4().hex, status="running", created_at=_now())
+            db.add(row)
+            db.commit()
+            job = _as_dict(row)
+            _trim_history(db)
+        finally:
+            db.close()
+        job_id = _active_job_id = job["job_id"]
+
+    future = _get_executor().submit(_run_training, time.time(), if_missing)
+    future.add_done_callback(lambda f: _on_done(job_id, f))
+    return job
+
+
+def submit_online_refresh():
+    # publish the online statistics' model in the background (online_model.absorb
+    # on drift). One in flight per process; the job re-reads the statistics
+    # when it runs, so triggers that arrive meanwhile fold into one more run
+    global _refresh_running, _refresh_again
+    with _lock:
+        if _refresh_running:
+            _refresh_again = True
+            return
+        _refresh_running = True
+        _refresh_again = False
+    future = _get_executor().submit(_run_online_refresh)
+    future.add_done_callback(_on_refresh_done)
+
+
+def _on_refresh_done(future):
+    global _refresh_running
+    try:
+        version, stages = future.result()
+        metrics.record_stages(stages)
+        if version is not None:
+            ml_model.registry.load()
+            response_cache.invalidate()
+    except Exception as e:
+        print(f"Online model refresh failed: {e}")
+    with _lock:
+        _refresh_running = False
+        again = _refresh_again
+    if again and _executor is not None:  # not after shutdown()
+        submit_online_refresh()
+
+
+def _trim_history(db):
+    # keep the last MAX_JOB_HISTORY jobs so the status API doesn't grow forever
+    keep = db.query(models.TrainingJob.job_id).order_by(
+        models.TrainingJob.created_at.desc()
+    ).limit(MAX_JOB_HISTORY).subquery()
+    db.query(models.TrainingJob).filter(
+        models.TrainingJob.status != "running", models.TrainingJob.job_id.not_in(keep.select())
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def get_job(job_id: str):
+    db = SessionLocal()
+    try:
+        job = db.get(models.TrainingJob, job_id)
+        return _as_dict(job) if job is not None else None
+    finally:
+        db.close()
+
+
+def list_jobs():
+    db = SessionLocal()
+    try:
+        return [_as_dict(j) for j in db.query(models.TrainingJob).order_by(models.TrainingJob.created_at.desc())]
+    finally:
+        db.close()
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None